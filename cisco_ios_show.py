@@ -11,6 +11,24 @@
      13 December 2015  |  1.2 - Enable password logic enhancements
                           1.3 - corrected documentation formatting
      19 January  2017  |  1.4 - Playbook sends Command to the remote devices one letter at a time.
+     16 October  2026  |  1.5 - Read until the device prompt returns rather than pacing commands with a fixed timer.
+                          1.6 - Fleet mode, capture an inventory of devices from one process.
+                          1.7 - Fleet mode event loop engine, one thread multiplexes the sessions.
+                          1.8 - Optionally attach to a session held by cisco_ios_broker.py.
+                          1.9 - Exec transport, each command on its own exec channel.
+                          1.10 - Spread the commands across several channels of the SSH connection.
+                          1.11 - Pipeline a window of commands, split the output at each prompt.
+                          1.12 - Stream output to the file, optionally compressed, with a limit for each command.
+                          1.13 - Side index of the offset and length of the output of each command.
+                          1.14 - Content-addressed store of the output, each unique output stored once.
+                          1.15 - Timings and byte counts of each phase and command, returned and written as metrics.
+                          1.16 - Trace of the session in Chrome trace event format, cProfile statistics.
+                          1.17 - Drift, the running configuration as a diff against that of the last capture.
+                          1.18 - Cache the output of commands which seldom change for a time to live.
+                          1.19 - Parse the output of high volume commands into tables of records, JSON or CSV.
+                          1.20 - Filters of the output of commands, sent as output modifiers where supported.
+                          1.21 - Checkpoint of the status of each host and command, resume issuing only the rest.
+                          1.22 - Pre-flight sweep of the SSH banner of each host, circuit breaker of unreachable hosts.
 
 """
 
@@ -65,6 +83,189 @@ options:
             - A switch to enable debug logging to a file. Use a value of 'on' to enable.
         required: false
 
+    timeout:
+        description:
+            - Seconds to wait for the device prompt to return after issuing a command, before giving up on the command.
+        required: false
+        default: 60
+
+    connect_timeout:
+        description:
+            - Seconds allowed for the TCP connection to the device and the SSH login.
+        required: false
+        default: 3.9
+
+    circuit:
+        description:
+            - Directory of the circuit breaker of each host, kept across runs. A host which cannot be reached, the
+              connection is refused or times out or no SSH banner is received, is not tried again for 5 minutes,
+              doubling with each failure after up to a day, and fails at once with the reason. A login closes the
+              circuit. In fleet mode, with --preflight, the SSH port of every host is probed at once with asyncio
+              before any login, and the hosts which do not send an SSH banner within connect_timeout are dropped.
+        required: false
+
+    broker:
+        description:
+            - Path of the Unix socket of cisco_ios_broker.py. Attach to the session the broker holds for the host and
+              username, left logged in and in enable mode by an earlier task, rather than login. Logs in directly if
+              the broker is not running or the session is in use.
+        required: false
+
+    transport:
+        description:
+            - How commands are issued. 'shell' types each command in an interactive shell and reads until the prompt
+              returns. 'exec' runs each command on its own exec channel and reads until the channel closes, suited to
+              devices where AAA places the user directly in privilege level 15. Falls back to 'shell' if the device
+              refuses exec channels, or if an enable password is specified and the user is not privilege level 15.
+              Not used with a broker or the fleet mode select engine.
+        required: false
+        default: shell
+        choices: [shell, exec]
+
+    channels:
+        description:
+            - Number of channels of the SSH connection to spread the commands across, the output is still written in
+              the order of the commands. Each additional shell is set up as the first, banners, terminal and enable
+              mode; devices which limit the channels of a connection use as many as they permit.
+              Not used with a broker or the fleet mode select engine.
+        required: false
+        default: 1
+
+    window:
+        description:
+            - Number of commands sent to the shell at once, rather than waiting for the prompt after each. The output
+              is split into the output of each command at the prompt which follows it. A window is also limited to the
+              commands which fit the device's typeahead buffer. Use a window of 5 to 20 for sites with a long round
+              trip time. Not used with the exec transport or the fleet mode select engine.
+        required: false
+        default: 1
+
+    maxbytes:
+        description:
+            - Limit of the output of each command written to the output file, in bytes. Output beyond the limit is
+              read and discarded, a line ' ### output truncated at <maxbytes> bytes ###' marks where. 0 is no limit.
+        required: false
+        default: 0
+
+    compress:
+        description:
+            - Write the output file compressed with gzip, cis_<host>_<julian-day>.log.gz. Each run appends a gzip
+              member, the file reads as one with zcat or gzip.open.
+        required: false
+        default: false
+
+    index:
+        description:
+            - Write a side index, the output file name with .idx appended, a line of JSON for each command giving
+              the command, start and end times, status (ok, truncated or timeout) and the offset and length in
+              bytes of its output in the output file. With compress, each command is a gzip member of its own.
+        required: false
+        default: false
+
+    store:
+        description:
+            - Rather than the output file, write the output of each command to a content-addressed store in the
+              destination directory. Output identical to output already stored, from another host or another
+              day, is not written again. The output of each command, less the echo of the command and the
+              prompt, is stored compressed as blobs/<ab>/<sha256>.gz. Each run writes a manifest,
+              manifests/<host>/<YYYYmmddTHHMMSS>.json, giving the sha256, status and times of each command.
+        required: false
+        default: false
+
+    metrics:
+        description:
+            - The seconds of each phase of the session (tcp_connect, ssh_login, shell, banners, terminal, enable, cache,
+              commands, logoff) and the seconds, bytes and status of each command are returned as 'metrics'.
+              Optionally also written to this file, a line of JSON is appended for each run. If the name ends
+              with .prom, a Prometheus textfile for the host, <name>_<host>.prom, is written for the textfile
+              collector of node_exporter, replaced with the metrics of the latest run.
+        required: false
+
+    profile:
+        description:
+            - File of Chrome trace events, for chrome://tracing or Perfetto, with a span for each command sent and
+              each wait for output. Each host is a process of the trace. The spans of every host and run are
+              appended to the file, so a play against many hosts shows where sessions sit idle.
+        required: false
+
+    pstats:
+        description:
+            - File of cProfile statistics of the module process, for the pstats module or snakeviz.
+        required: false
+
+    drift:
+        description:
+            - Keep the running configuration of the last capture of each host, the baseline, in
+              <dest>/baselines/<host>/. The output of 'show running-config' is written as a unified diff against the
+              baseline, or as ' ### no change, sha256 <sha256> ###' if it is unchanged; the first capture is written
+              in full. Lines which change without a change of the configuration, the time of the last change or
+              'ntp clock-period' for example, are ignored. 'changed' is true if the configuration has drifted, and
+              'drift' gives the status (new, changed, unchanged, or timeout or truncated, when the baseline is kept)
+              and sha256 of the configuration.
+        required: false
+        default: false
+
+    cache:
+        description:
+            - Directory of a cache of the output of commands which seldom change, shared by every host and run. The
+              output of a command named by cache_ttl is written to the output file from the cache, marked
+              ' ### cached <time>, <seconds> seconds old ###', rather than issued, until its time to live expires.
+              The output of the cache is stale, and the command issued, if the device has reloaded since, from the
+              uptime of 'show version | include uptime' issued once per run, or if the running configuration has
+              changed since, when 'show running-config' is one of the commands. Its status in the index and the
+              metrics is 'cached'.
+        required: false
+
+    cache_ttl:
+        description:
+            - The commands whose output is cached, and the seconds it is cached for,
+              {"show inventory": 86400, "show license": 86400}.
+        required: false
+
+    cache_size:
+        description:
+            - Limit of the size of the cache in bytes, the least recently used output is removed beyond it.
+        required: false
+        default: 67108864
+
+    parse:
+        description:
+            - Parse the output of 'show ip interface brief', 'show ip route', 'show cdp neighbors detail', 'show vlan'
+              and 'show interfaces trunk' into records as it is received, and append them to a file for each table,
+              <output file less .log>_<table>.json, a line of JSON for each record, or .csv. Each record names its
+              host. The tables are ip_interface_brief, ip_route, cdp_neighbor_detail, vlan and interface_trunk.
+              'parsed' gives the number of records of each table.
+        required: false
+        choices: [json, csv]
+
+    filters:
+        description:
+            - Filters of the output of commands, a modifier and a regular expression or a list of them,
+              {"show running-config": "section ^interface", "show ip route": ["include via", "exclude Null0"]}.
+              The modifiers are include, exclude, begin and section, and may be abbreviated. If the device
+              supports output modifiers, tested once per run with 'show privilege | include level', the first
+              filter is added to the command sent, 'show running-config | section ^interface', and the device
+              sends only the lines which pass. Other filters, or all of them if the device does not support
+              output modifiers, are applied to the output as it is received. A section is a line which is not
+              indented and the indented lines which follow it, it passes if a line of it matches.
+        required: false
+
+    checkpoint:
+        description:
+            - Path of the checkpoint of the run, a file of JSON lines. When the session of a host ends, a line
+              giving its status, and the status of each command issued, is appended,
+              {"host": "isr-2911-a", "status": "failed", "msg": null, "commands": {"show version": "ok",
+              "show tech-support": "timeout"}, "time": 1792123456.789}.
+        required: false
+
+    resume:
+        description:
+            - Resume the run of the checkpoint, the commands of the host whose last status is ok, truncated or
+              cached are not issued again, nor appended to the output file again. Only the commands which
+              failed, timed out or were not reached are issued. 'skipped' gives the number not issued.
+        required: false
+        default: false
+
 """
 EXAMPLES = """
 
@@ -88,10 +289,1066 @@ EXAMPLES = """
       dest: /tmp
       debug: on
 
+
+  Fleet mode, the same capture for each host of an inventory from a single process, without Ansible.
+  Hosts are read one per line, group headers and host variables of an Ansible INI inventory are ignored.
+  The commands are read one per line. Up to --forks devices are captured at a time, the password and
+  enable password are prompted for unless set in the environment as IOS_PASSWORD and IOS_ENABLEPW.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /tmp --username admin --forks 50
+
+  A summary of the success or failure of each host is written to stdout as JSON.
+
+  With --engine select, rather than a thread per device, a single thread multiplexes the channels of all
+  open sessions with a selector. Only the SSH logins, which block, run in a pool of --logins threads.
+  Requires Python 3.4 or later.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /tmp --username admin \\
+                      --engine select --forks 500 --logins 16
+
+  With index, the output of one command is read from the output file without reading the rest.
+
+  import cisco_ios_show
+  path = "/tmp/cis_isr-2911-a_289.log.gz"
+  entry = [item for item in cisco_ios_show.read_index(path) if item["command"] == "show version"][-1]
+  print(cisco_ios_show.read_entry(path, entry))
+
+  With store, the daily audit of the fleet writes only output which has changed, or is new to the store.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin --store
+
+  manifest = json.load(open("/var/audit/manifests/isr-2911-a/20261016T020000.json"))
+  for item in manifest["commands"]:
+      print(item["command"], cisco_ios_show.read_blob("/var/audit", item["sha256"]))
+
+  With drift, the summary names the hosts whose configuration has changed since the last run.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin --drift
+
+  drifted = [host for host, result in summary["hosts"].items() if result.get("changed")]
+
+  The output of a command captured earlier is parsed with parse_output, for one read from the output file.
+
+  routes = cisco_ios_show.parse_output("show ip route", cisco_ios_show.read_entry(path, entry))
+
+  With a cache, 'show inventory' and 'show license' are issued at most once a day, or after a reload or a change.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin \\
+                      --cache /var/cache/ios --cache-ttl "show inventory=86400" --cache-ttl "show license=86400"
+
+  With filters, only the interfaces of the running configuration and the routes learned by OSPF are sent.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin \
+                      --filter "show running-config=section ^interface" --filter "show ip route=include ^O"
+
+  With a checkpoint, a run which was interrupted, or in which hosts timed out, is run again with --resume and
+  issues only the commands which did not complete.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin \
+                      --checkpoint /var/audit/run-289.json
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin \
+                      --checkpoint /var/audit/run-289.json --resume
+
+  With --preflight, hosts which are down or filtered cost one connect timeout between them, not one each, and
+  with --circuit the hosts known to be down are not tried again until their circuit expires.
+
+  ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin \
+                      --preflight --circuit /var/audit/circuit --connect-timeout 2
+
 """
 
 import paramiko
+import argparse
+import codecs
+import csv
+import difflib
+import getpass
+import gzip
+import hashlib
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
 import time
+import zlib
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import selectors
+except ImportError:
+    selectors = None                                       # Python 2, the select engine is not available
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None                                         # Python 2, the pre-flight sweep is not available
+
+try:
+    from ansible.module_utils.ios_common import BrokerChannel, Tracer, read_inventory, start_pstats, stop_pstats
+    from ansible.module_utils.ios_common import write_metrics
+except ImportError:                                        # run from the command line, module_utils beside the module
+    from module_utils.ios_common import BrokerChannel, Tracer, read_inventory, start_pstats, stop_pstats
+    from module_utils.ios_common import write_metrics
+
+# ---------------------------------------------------------------------------
+# OUTPUT
+# ---------------------------------------------------------------------------
+
+class OutputFile(object):
+    """ The output file of a host, text or compressed with gzip. With an index, each command is an
+        entry of the side index, <output file>.idx, a line of JSON giving its command, start and end
+        times, status and the offset and length in bytes of its output in the output file, so
+        tooling reads one command without reading the rest. Compressed, each command is a gzip
+        member of its own, read by decompressing the length bytes at the offset.
+    """
+
+    def __init__(self, path, compress=False, index=False):
+
+        self.path = path
+        self.compress = compress
+        self.file_obj = open(path, "ab")
+        self.file_obj.seek(0, os.SEEK_END)                 # tell() is the offset of the next write
+        self.index = open("%s.idx" % path, "a") if index else None
+        self.member = None                                 # gzip member being written
+        self.entry = None                                  # index entry of the command being written
+
+    def write(self, data):
+        " write text, compressed if requested"
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        if self.compress:
+            if self.member is None:
+                self.member = gzip.GzipFile(fileobj=self.file_obj, mode="wb")
+            self.member.write(data)
+        else:
+            self.file_obj.write(data)
+
+    def end_member(self):
+        " end the gzip member being written, the file object is left open"
+        if self.member is not None:
+            self.member.close()
+            self.member = None
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        if self.index is None:
+            return
+        self.end_member()
+        self.entry = dict(command=command, start=round(start or time.time(), 3), offset=self.file_obj.tell())
+
+    def end(self, status, end=None):
+        " the output of the command is complete, write its entry to the index"
+        if self.entry is None:
+            return
+        self.end_member()
+        self.entry.update(end=round(end or time.time(), 3), status=status,
+                          length=self.file_obj.tell() - self.entry["offset"])
+        self.index.write("%s\n" % json.dumps(self.entry, sort_keys=True))
+        self.entry = None
+
+    def close(self):
+        " close the output file and the index"
+        if self.entry is not None:                         # the session ended before the command completed
+            self.end("timeout")
+        self.end_member()
+        self.file_obj.close()
+        if self.index is not None:
+            self.index.close()
+
+
+
+class Spool(object):
+    """ The output of a window of commands issued on another channel, held until the output of the
+        windows before it has been written. Spills to disk beyond IOS.SPOOL_LEN bytes.
+    """
+
+    def __init__(self):
+
+        self.file_obj = tempfile.SpooledTemporaryFile(max_size=IOS.SPOOL_LEN, mode="w+b")
+        self.length = 0
+        self.entries = []                                  # [command, start, end, status, offset, length]
+
+    def write(self, data):
+        " write to the spool"
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        self.file_obj.write(data)
+        self.length = self.length + len(data)
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.entries.append([command, start or time.time(), None, None, self.length, None])
+
+    def end(self, status, end=None):
+        " the output of the command is complete"
+        entry = self.entries[-1]
+        entry[2:4] = [end or time.time(), status]
+        entry[5] = self.length - entry[4]
+
+    def copy(self, length, output):
+        " copy length bytes of the spool to the output"
+        while length > 0:
+            data = self.file_obj.read(min(length, IOS.BUFFER_LEN))
+            if not data:
+                break
+            output.write(data)
+            length = length - len(data)
+
+    def replay(self, output):
+        " write the spool to the output file, with the entries of its commands, and discard it"
+        self.file_obj.seek(0)
+        offset = 0
+        for command, start, end, status, begin, length in self.entries:
+            self.copy(begin - offset, output)
+            output.begin(command, start)
+            self.copy(length, output)
+            output.end(status, end)
+            offset = begin + length
+        self.copy(self.length - offset, output)
+        self.file_obj.close()
+
+
+
+def read_index(path):
+    " Return the entries of the index of an output file, oldest first."
+
+    entries = []
+    with open("%s.idx" % path) as index:
+        for line in index:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+
+def read_entry(path, entry):
+    " Return the output of the command of an index entry, reading only its bytes of the output file."
+
+    with open(path, "rb") as file_obj:
+        file_obj.seek(entry["offset"])
+        data = file_obj.read(entry["length"])
+    if path.endswith(".gz"):
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)  # a gzip member
+    return data.decode("utf-8", "replace")
+
+
+
+class Store(object):
+    """ A content-addressed store of the output of each command, shared by the hosts of the fleet
+        and by each run. The output of a command, less the echo of the command and the prompt, is
+        stored once, compressed, as <dest>/blobs/<ab>/<sha256>.gz and each run of a host writes a
+        manifest, <dest>/manifests/<host>/<time>.json, naming the blob of each command.
+    """
+
+    def __init__(self, destination_directory, host):
+
+        self.destination_directory = destination_directory
+        self.manifest = dict(host=host, start=round(time.time(), 3), commands=[])
+        self.path = "%s/manifests/%s/%s.json" % (destination_directory, host, time.strftime("%Y%m%dT%H%M%S"))
+        self.spool = None                                  # output of the command being written
+        self.entry = None
+        for directory in (os.path.dirname(self.path), "%s/blobs" % destination_directory):
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:                            # created by another host of the fleet
+                    pass
+
+    def write(self, data):
+        " write the output of a command, output outside of a command, the header, is not stored"
+        if self.spool is None:
+            return
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        if self.entry["first"] < 0 and b"\n" in data:      # end of the echo of the command
+            self.entry["first"] = self.entry["length"] + data.index(b"\n") + 1
+        if b"\n" in data:                                  # start of the prompt
+            self.entry["last"] = self.entry["length"] + data.rindex(b"\n") + 1
+        self.spool.write(data)
+        self.entry["length"] = self.entry["length"] + len(data)
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.spool = tempfile.SpooledTemporaryFile(max_size=IOS.SPOOL_LEN, mode="w+b")
+        self.entry = dict(command=command, start=round(start or time.time(), 3), length=0, first=-1, last=0)
+
+    def end(self, status, end=None):
+        " the output of the command is complete, store it unless the same output is stored"
+        first = max(self.entry["first"], 0)
+        length = max(self.entry["last"] - first, 0)
+        digest = hashlib.sha256()
+        self.spool.seek(first)
+        self.copy(length, digest.update)
+        digest = digest.hexdigest()
+
+        path = blob_path(self.destination_directory, digest)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    pass
+            handle, temporary = tempfile.mkstemp(dir=directory)
+            with os.fdopen(handle, "wb") as file_obj:
+                member = gzip.GzipFile(fileobj=file_obj, mode="wb")
+                self.spool.seek(first)
+                self.copy(length, member.write)
+                member.close()
+            os.rename(temporary, path)                     # the same output may be stored by another host
+
+        self.spool.close()
+        self.spool = None
+        self.manifest["commands"].append(dict(command=self.entry["command"], start=self.entry["start"],
+                                              end=round(end or time.time(), 3), status=status,
+                                              sha256=digest, length=length))
+        self.entry = None
+
+    def copy(self, length, write):
+        " pass length bytes of the spool to write"
+        while length > 0:
+            data = self.spool.read(min(length, IOS.BUFFER_LEN))
+            if not data:
+                break
+            write(data)
+            length = length - len(data)
+
+    def close(self):
+        " write the manifest of the run"
+        if self.entry is not None:                         # the session ended before the command completed
+            self.end("timeout")
+        self.manifest["end"] = round(time.time(), 3)
+        with open(self.path, "w") as manifest:
+            json.dump(self.manifest, manifest, indent=1, sort_keys=True)
+
+
+
+def blob_path(destination_directory, digest):
+    " Return the path of the blob of output with the digest."
+
+    return "%s/blobs/%s/%s.gz" % (destination_directory, digest[:2], digest)
+
+
+
+def read_blob(destination_directory, digest):
+    " Return the output of a command stored with the digest."
+
+    with gzip.open(blob_path(destination_directory, digest), "rb") as file_obj:
+        return file_obj.read().decode("utf-8", "replace")
+
+
+
+class Drift(object):
+    """ The running configuration compared with the baseline, the configuration of the last capture of
+        the host, <dest>/baselines/<host>/<command>.cfg. Rather than the configuration, the output file
+        is given a unified diff against the baseline, or a line marking it unchanged, and the baseline is
+        replaced. Lines which change without a change of the configuration, the time of the last change
+        for example, are ignored. The output of other commands, and of configuration commands which are
+        filtered, is written as it is.
+    """
+
+                                                           # 'sh run', 'show running-config', 'show run all'
+    COMMAND = re.compile(r"^sh(ow?)?\s+run(n(i(n(g(-(c(o(n(f(i(g)?)?)?)?)?)?)?)?)?)?)?(\s|$)")
+    VOLATILE = re.compile(r"^(Building configuration|Current configuration|! Last configuration change|"
+                          r"! NVRAM config last updated|! No configuration change since|ntp clock-period)")
+    UNCHANGED = " ### no change, sha256 %s ###\r\n"
+
+    def __init__(self, file_obj, destination_directory, host, partial=None):
+
+        self.file_obj = file_obj                           # the output file, or store, written to
+        self.directory = "%s/baselines/%s" % (destination_directory, host)
+        self.partial = partial if partial is not None else set()  # commands sent whose output is filtered
+        self.command = None                                # the configuration command being written
+        self.data = None                                   # its output, held until complete
+        self.changes = []                                  # the result of each configuration command
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:                                # created by another run of the host
+                pass
+
+    def write(self, data):
+        " hold the output of a configuration command, write any other"
+        if self.data is None:
+            self.file_obj.write(data)
+            return
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        self.data.append(data)
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.file_obj.begin(command, start)
+        if command and Drift.COMMAND.match(command.strip()) and " ".join(command.split()) not in self.partial:
+            self.command = command.strip()
+            self.data = []
+
+    def end(self, status, end=None):
+        " the output of the command is complete, compare a configuration with the baseline"
+        if self.data is not None:
+            data = b"".join(self.data)
+            self.data = None
+            self.file_obj.write(self.compare(data, status))
+        self.file_obj.end(status, end)
+
+    @staticmethod
+    def parse(data, command):
+        """ Return a tuple of the offsets of the configuration in the output of the command, after the
+            echo of the command and before the prompt, and its lines less those which are volatile.
+        """
+
+        first = data.find(b"\n") + 1                       # the echo of the command, none from exec channels
+        if command.encode("utf-8") not in data[:first]:
+            first = 0
+        last = data.rfind(b"\n") + 1                       # the prompt
+        if last < first or not IOS.PROMPT.search(data[last:].decode("utf-8", "replace")):
+            last = len(data)
+        lines = [line.rstrip() for line in data[first:last].decode("utf-8", "replace").splitlines()
+                 if line.strip() and not Drift.VOLATILE.match(line)]
+        return first, last, lines
+
+    def compare(self, data, status):
+        " Return the output to write for the configuration, replace the baseline if it has changed."
+
+        first, last, lines = Drift.parse(data, self.command)
+        config = "".join(["%s\n" % line for line in lines])
+        digest = hashlib.sha256(config.encode("utf-8")).hexdigest()
+        change = dict(command=self.command, sha256=digest, status="new")
+        self.changes.append(change)
+        if status != "ok":                                 # incomplete, the baseline is kept
+            change.update(status=status, sha256=None)
+            return data
+
+        path = "%s/%s.cfg" % (self.directory, re.sub(r"[^\w.\-]+", "_", self.command))
+        baseline = None
+        if os.path.exists(path):
+            with open(path, "rb") as file_obj:
+                baseline = file_obj.read().decode("utf-8", "replace")
+        previous = hashlib.sha256(baseline.encode("utf-8")).hexdigest() if baseline is not None else None
+        if previous == digest:
+            change["status"] = "unchanged"
+            return data[:first] + (Drift.UNCHANGED % digest).encode("utf-8") + data[last:]
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "wb") as file_obj:
+            file_obj.write(config.encode("utf-8"))
+        os.rename(temporary, path)                         # a partial baseline is never read
+        if baseline is None:                               # the first capture, written in full
+            return data
+
+        diff = list(difflib.unified_diff(baseline.splitlines(), lines, "sha256 %s" % previous,
+                                         "sha256 %s" % digest, lineterm=""))
+        change.update(status="changed", previous=previous,
+                      added=len([line for line in diff[2:] if line.startswith("+")]),
+                      removed=len([line for line in diff[2:] if line.startswith("-")]))
+        return data[:first] + ("%s\r\n" % "\r\n".join(diff)).encode("utf-8") + data[last:]
+
+    def result(self):
+        " the keyword arguments for exit_json, changed if a configuration differs from its baseline"
+        return dict(changed=any([change["status"] == "changed" for change in self.changes]), drift=self.changes)
+
+    def close(self):
+        " close the output file"
+        if self.data is not None:                          # the session ended before the command completed
+            self.end("timeout")
+        self.file_obj.close()
+
+
+
+class Cache(object):
+    """ The output of commands which seldom change, 'show inventory' for example, kept for a time to
+        live and written to the output file in place of issuing the command. The output of each command
+        of a host is an entry of its own, <cache>/<host>/<sha1 of command>.json. An entry is stale if it
+        is older than the time to live of its command, if the device has reloaded since, from the uptime
+        of 'show version', or if the running configuration has changed since, when 'show running-config'
+        is captured. When the cache is larger than its size, the least recently used entries are removed.
+        The output of commands which are filtered is neither cached nor replayed.
+    """
+
+    PROBE = "show version | include uptime"                # the uptime, issued when any command may be cached
+    UPTIME = re.compile(r"uptime is (.*)")
+    UNITS = dict(year=31536000, week=604800, day=86400, hour=3600, minute=60)
+    SLACK = 300.0                                          # seconds the boot time may differ, uptime is in minutes
+    CACHED = " ### cached %s, %s seconds old ###\r\n"
+    SIZE = 67108864                                        # default size of the cache in bytes
+
+    def __init__(self, file_obj, directory, host, ttl, size=None, partial=None):
+
+        self.file_obj = file_obj                           # the output file, or store, written to
+        self.directory = directory
+        self.path = "%s/%s" % (directory, host)
+        self.ttl = ttl                                     # command: seconds, the commands which are cached
+        self.size = size or Cache.SIZE
+        self.partial = partial if partial is not None else set()  # commands sent whose output is filtered
+        self.boot = None                                   # boot time of the device, from the uptime
+        self.config = None                                 # sha256 of the running configuration
+        self.command = None                                # the command being written, if it is cached
+        self.data = None                                   # its output, held until complete
+        self.stored = False                                # entries were written, the cache may need eviction
+        self.entries = []                                  # the entries of this run, written when it ends
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:                                # created by another run of the host
+                pass
+        if os.path.exists("%s/running-config.sha256" % self.path):
+            with open("%s/running-config.sha256" % self.path) as file_obj:
+                self.config = file_obj.read().strip() or None
+
+    def entry_path(self, command):
+        " the path of the entry of a command"
+        return "%s/%s.json" % (self.path, hashlib.sha1(command.encode("utf-8")).hexdigest())
+
+    def validate(self, output):
+        " learn the boot time of the device from the output of Cache.PROBE"
+        match = Cache.UPTIME.search(output)
+        if match is None:
+            return
+        seconds = 0
+        for count, unit in re.findall(r"(\d+)\s+(year|week|day|hour|minute)", match.group(1)):
+            seconds = seconds + int(count) * Cache.UNITS[unit]
+        self.boot = time.time() - seconds
+
+    def lookup(self, command):
+        " Return the entry of the command if it is fresh, or None."
+
+        command = " ".join(command.split())
+        if command not in self.ttl or command in self.partial or not os.path.exists(self.entry_path(command)):
+            return None
+        try:
+            with open(self.entry_path(command)) as file_obj:
+                entry = json.load(file_obj)
+        except (IOError, OSError, ValueError):             # removed by eviction, or written partially
+            return None
+        if time.time() - entry["time"] > self.ttl[command] or entry["config"] != self.config:
+            return None
+        if (entry["boot"] is None) != (self.boot is None):
+            return None
+        if self.boot is not None and abs(entry["boot"] - self.boot) > Cache.SLACK:
+            return None                                    # reloaded since
+        return entry
+
+    def replay(self, command, sink, metrics=None):
+        " Write the output of the command from the cache to the sink, returns False if it is not cached."
+
+        entry = self.lookup(command)
+        if entry is None:
+            return False
+        started = time.time()
+        try:
+            os.utime(self.entry_path(" ".join(command.split())), None)  # recently used
+        except OSError:
+            pass
+        output = entry["output"].encode("utf-8")
+        first = Drift.parse(output, command)[0]            # the marker follows the echo of the command
+        sink.begin(command, started)
+        sink.write(output[:first])
+        sink.write(Cache.CACHED % (time.asctime(time.localtime(entry["time"])), int(started - entry["time"])))
+        sink.write(output[first:])
+        sink.end("cached")
+        if metrics is not None:
+            metrics.append(dict(command=command, start=round(started, 3), status="cached", seconds=0.0, bytes=0))
+        return True
+
+    def write(self, data):
+        " write the output to the output file, hold the output of a command which is cached"
+        if self.data is not None:
+            self.data.append(data if isinstance(data, bytes) else data.encode("utf-8"))
+        self.file_obj.write(data)
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.file_obj.begin(command, start)
+        self.command = " ".join((command or "").split())
+        if self.command in self.partial:                   # not the whole output of the command
+            return
+        if self.command in self.ttl or Drift.COMMAND.match(self.command):
+            self.data = []
+
+    def end(self, status, end=None):
+        " the output of the command is complete, write the entry of a cached command"
+        self.file_obj.end(status, end)
+        if self.data is None:
+            return
+        data = b"".join(self.data)
+        self.data = None
+        if status != "ok":
+            return
+        if Drift.COMMAND.match(self.command):              # the entries are stale if the configuration has changed
+            config = hashlib.sha256("".join(["%s\n" % line for line in Drift.parse(data, self.command)[2]])
+                                    .encode("utf-8")).hexdigest()
+            if config != self.config:
+                self.config = config
+                self.save("%s/running-config.sha256" % self.path, config)
+        if self.command in self.ttl:
+            self.entries.append(dict(command=self.command, time=round(time.time(), 3), boot=self.boot,
+                                     output=data.decode("utf-8", "replace")))
+
+    def save(self, path, text):
+        " write a file of the cache, renamed so a partial file is never read"
+        handle, temporary = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(handle, "wb") as file_obj:
+            file_obj.write(text.encode("utf-8"))
+        os.rename(temporary, path)
+        self.stored = True
+
+    def evict(self):
+        " remove the least recently used entries of every host until the cache is within its size"
+        entries = []
+        for path, directories, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    try:
+                        status = os.stat(os.path.join(path, name))
+                    except OSError:
+                        continue
+                    entries.append((status.st_mtime, status.st_size, os.path.join(path, name)))
+        total = sum([size for mtime, size, path in entries])
+        for mtime, size, path in sorted(entries):
+            if total <= self.size:
+                break
+            try:
+                os.remove(path)
+            except OSError:                                # removed by another host
+                pass
+            total = total - size
+
+    def close(self):
+        """ close the output file, write the entries of the run with the configuration of the run, which
+            may be captured after them, and evict entries if any were written
+        """
+        if self.data is not None:                          # the session ended before the command completed
+            self.end("timeout")
+        self.file_obj.close()
+        for entry in self.entries:
+            entry["config"] = self.config
+            self.save(self.entry_path(entry["command"]), json.dumps(entry))
+        self.entries = []
+        if self.stored:
+            self.evict()
+
+
+
+class LocalFilter(object):
+    """ An output modifier of IOS, '| include', '| exclude', '| begin' or '| section', applied to the
+        output as it is written, for devices which do not support the modifier. The echo of the command,
+        the prompt and the marks of this module are written as they are.
+    """
+
+    def __init__(self, file_obj, kind, pattern):
+
+        self.file_obj = file_obj
+        self.kind = kind                                   # include, exclude, begin or section
+        self.pattern = re.compile(pattern)
+        self.partial = ""                                  # the last line, until it is complete
+        self.echo = True                                   # the first line is the echo of the command
+        self.begun = False
+        self.section = []                                  # the lines of the section, until it ends
+        self.matched = False                               # a line of the section matches
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.file_obj.begin(command, start)
+
+    def write(self, data):
+        " write the complete lines which pass the filter, hold the last"
+        lines = (self.partial + data).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self.line("%s\n" % line)
+
+    def line(self, line):
+        " write the line if it passes the filter"
+        if self.echo or line.startswith(" ### "):
+            self.echo = False
+            self.file_obj.write(line)
+        elif self.kind == "include":
+            if self.pattern.search(line.rstrip("\r\n")):
+                self.file_obj.write(line)
+        elif self.kind == "exclude":
+            if not self.pattern.search(line.rstrip("\r\n")):
+                self.file_obj.write(line)
+        elif self.kind == "begin":
+            self.begun = self.begun or bool(self.pattern.search(line.rstrip("\r\n")))
+            if self.begun:
+                self.file_obj.write(line)
+        else:
+            if not line[:1].isspace():                     # the first line of a section
+                self.end_section()
+            self.section.append(line)
+            self.matched = self.matched or bool(self.pattern.search(line.rstrip("\r\n")))
+
+    def end_section(self):
+        " write the section if a line of it matches"
+        if self.matched:
+            self.file_obj.write("".join(self.section))
+        self.section = []
+        self.matched = False
+
+    def end(self, status, end=None):
+        " write the last section and the prompt"
+        self.end_section()
+        self.file_obj.write(self.partial)
+        self.partial = ""
+        self.file_obj.end(status, end)
+
+
+
+class CommandWriter(object):
+    """ Write the output of one command to the output file as it is received, up to a limit of
+        bytes. Output beyond the limit is discarded, less the prompt which ends it.
+    """
+
+    TRUNCATED = "\r\n ### output truncated at %s bytes ###\r\n%s"
+
+    def __init__(self, file_obj, limit=0, command=None, prompt=True, metrics=None):
+
+        self.file_obj = file_obj
+        self.limit = limit                                 # 0 is no limit
+        self.prompt = prompt                               # the output ends with the prompt, exec channels have none
+        self.command = command
+        self.metrics = metrics                             # list the timing of the command is appended to
+        self.started = time.time()
+        self.received = 0
+        self.written = 0
+        self.truncated = False
+        self.tail = ""                                     # end of the output, holds the prompt
+        self.file_obj.begin(command)
+
+    def write(self, data):
+        " write the data, or the part of it within the limit"
+        self.received = self.received + len(data)
+        self.tail = (self.tail + data)[-IOS.TAIL_LEN:]
+        if not self.limit or self.written + len(data) <= self.limit:
+            self.file_obj.write(data)
+            self.written = self.written + len(data)
+            return
+        if self.written < self.limit:
+            self.file_obj.write(data[:self.limit - self.written])
+            self.written = self.limit
+        self.truncated = True
+
+    def close(self, complete=True):
+        " mark the output as truncated and write the prompt which ended it, complete is False on a timeout"
+        status = "ok" if complete else "timeout"
+        if self.truncated:
+            prompt = self.tail.splitlines()[-1] if self.prompt and self.tail.strip() else ""
+            self.file_obj.write(CommandWriter.TRUNCATED % (self.limit, prompt))
+            status = "truncated" if complete else status
+        self.file_obj.end(status)
+        if self.metrics is not None:
+            self.metrics.append(dict(command=self.command, start=round(self.started, 3), status=status,
+                                     seconds=round(time.time() - self.started, 4), bytes=self.received))
+
+# ---------------------------------------------------------------------------
+# PARSE
+# ---------------------------------------------------------------------------
+
+def keywords(*words):
+    """ Return a pattern matching a command and its abbreviations, each word is given as the least
+        abbreviation, a period, and the rest of the word: keywords("sh.ow", "ip", "ro.ute").
+    """
+
+    pattern = []
+    for word in words:
+        least, rest = (word.split(".") + [""])[:2]
+        optional = ""
+        for character in reversed(rest):
+            optional = "(?:%s%s)?" % (re.escape(character), optional)
+        pattern.append(re.escape(least) + optional)
+    return r"\s+".join(pattern)
+
+
+
+def route_prefix(record):
+    " the prefix of a route, with the length of the mask of a classful network which is subnetted"
+    if "/" not in record["prefix"] and record.get("mask"):
+        record["prefix"] = "%s/%s" % (record["prefix"], record["mask"])
+    return record
+
+
+
+def trunk_vlans(record):
+    " the vlans of a row of a section of 'show interface trunk', the column named by the section"
+    if record.get("section") != "mode" and "vlans" in record:
+        record[record["section"]] = record["vlans"]
+    return record
+
+
+ROUTE = (r"(?P<protocol>[A-Za-z+%]{1,2}\*?(?: [A-Z0-9]{1,2})?)\s+(?P<prefix>\d+\.\d+\.\d+\.\d+(?:/\d+)?)")
+VIA = (r"\[(?P<distance>\d+)/(?P<metric>\d+)\] via (?P<next_hop>[\d.]+)(?:, (?P<age>\d[\w:.]*))?"
+       r"(?:, (?P<interface>[\w./:\-]+))?\s*$")
+
+                                                           # The rules of each table, the first which matches a
+                                                           # line is applied:
+                                                           #   new     a record of the groups of the line
+                                                           #   update  set the groups of the line in the record
+                                                           #   first   set the groups not already set
+                                                           #   append  add the groups to the fields of the record
+                                                           #   repeat  fill the fields of the record, or if they
+                                                           #           are set, a copy of it with the groups
+                                                           #   hold    fields of the records which follow, the
+                                                           #           groups of the line and those of the rule
+                                                           #   stop    the rest of the output is not parsed
+TABLES = [
+    dict(name="ip_interface_brief",
+         command=keywords("sh.ow", "ip", "int.erface", "br.ief"),
+         columns=["interface", "ip_address", "ok", "method", "status", "protocol"],
+         rules=[(r"(?P<interface>\S+)\s+(?P<ip_address>[\d.]+|unassigned)\s+(?P<ok>YES|NO)\s+(?P<method>\S+)\s+"
+                 r"(?P<status>up|down|administratively down|deleted)\s+(?P<protocol>up|down)\s*$", "new")]),
+    dict(name="ip_route",
+         command=keywords("sh.ow", "ip", "ro.ute") + r"(?:\s.*)?",
+         columns=["protocol", "prefix", "distance", "metric", "next_hop", "age", "interface"],
+         integers=["distance", "metric"],
+         finish=route_prefix,
+         rules=[(ROUTE + r" is directly connected, (?P<interface>[\w./:\-]+)\s*$", "new"),
+                (ROUTE + r"\s+" + VIA, "new"),
+                (ROUTE + r"\s*$", "new"),                  # the route continues on the next line
+                (r"\s+" + VIA, "repeat"),                  # another path of the route
+                (r"\s+[\d.]+/(?P<mask>\d+) is subnetted", "hold"),
+                (r"\s+[\d.]+/\d+ is variably subnetted", "hold", dict(mask=None))]),
+    dict(name="cdp_neighbor_detail",
+         command=keywords("sh.ow", "cdp", "n.eighbors", "det.ail"),
+         columns=["device_id", "ip_address", "platform", "capabilities", "local_interface", "remote_interface",
+                  "holdtime", "software_version", "native_vlan", "duplex"],
+         integers=["holdtime", "native_vlan"],
+         rules=[(r"Device ID:\s*(?P<device_id>\S+)", "new"),
+                (r"\s+IP(?:v4)? address:\s*(?P<ip_address>\S+)", "first"),
+                (r"Platform:\s*(?P<platform>[^,]+?)\s*,\s*Capabilities:\s*(?P<capabilities>.*?)\s*$", "update"),
+                (r"Interface:\s*(?P<local_interface>[^,]+?)\s*,\s*Port ID \(outgoing port\):\s*"
+                 r"(?P<remote_interface>.*?)\s*$", "update"),
+                (r"Holdtime\s*:\s*(?P<holdtime>\d+)", "update"),
+                (r".*[Vv]ersion (?P<software_version>[\w.()\-]+)", "first"),
+                (r"Native VLAN:\s*(?P<native_vlan>\d+)", "update"),
+                (r"Duplex:\s*(?P<duplex>\S+)", "update")]),
+    dict(name="vlan",
+         command=keywords("sh.ow", "vl.an") + r"(?:\s+br.*)?",
+         columns=["vlan", "name", "status", "ports"],
+         integers=["vlan"],
+         rules=[(r"(?P<vlan>\d+)\s+(?P<name>\S+)\s+(?P<status>active|act/\S+|suspended|sus/\S+)"
+                 r"(?:\s+(?P<ports>\S.*?))?\s*$", "new"),
+                (r"\s{20,}(?P<ports>\S.*?)\s*$", "append"),
+                (r"VLAN\s+Type", "stop")]),
+    dict(name="interface_trunk",
+         command=keywords("sh.ow", "int.erfaces", "tr.unk"),
+         columns=["port", "mode", "encapsulation", "status", "native_vlan", "allowed", "active", "forwarding"],
+         integers=["native_vlan"],
+         key="port",
+         finish=trunk_vlans,
+         rules=[(r"Port\s+Mode\s+Encapsulation", "hold", dict(section="mode")),
+                (r"Port\s+Vlans allowed on trunk", "hold", dict(section="allowed")),
+                (r"Port\s+Vlans allowed and active", "hold", dict(section="active")),
+                (r"Port\s+Vlans in spanning tree", "hold", dict(section="forwarding")),
+                (r"(?P<port>\S+)\s+(?P<mode>\S+)\s+(?P<encapsulation>\S+)\s+(?P<status>\S+)\s+"
+                 r"(?P<native_vlan>\d+)\s*$", "new"),
+                (r"(?P<port>\S+)\s+(?P<vlans>[\d,\-]+|none)\s*$", "new")]),
+]
+for table in TABLES:                                       # compiled once, when the module is loaded
+    table["command"] = re.compile(r"%s\s*$" % table["command"])
+    table["rules"] = [(re.compile(rule[0]), rule[1], (rule[2:] or [{}])[0]) for rule in table["rules"]]
+    table.setdefault("integers", [])
+    table.setdefault("key", None)
+    table.setdefault("finish", None)
+
+
+
+class TableParser(object):
+    """ Parse the output of a command into records of the columns of its table, a line at a time as
+        the output is received. Each line is matched in place, in the buffer of output received, by
+        the rules of the table; the records are passed to emit.
+    """
+
+    def __init__(self, table, emit):
+
+        self.table = table
+        self.emit = emit
+        self.buffer = ""                                   # output received, less the lines parsed
+        self.record = None                                 # the record being parsed
+        self.held = {}                                     # fields of the records which follow
+        self.keyed = {}                                    # records merged by the key of the table
+        self.stopped = False
+
+    def feed(self, text):
+        " parse the complete lines of the text, hold the rest"
+        buffer = self.buffer + text if self.buffer else text
+        start = 0
+        newline = buffer.find("\n")
+        while newline >= 0:
+            self.line(buffer, start, newline)
+            start = newline + 1
+            newline = buffer.find("\n", start)
+        self.buffer = buffer[start:]
+
+    def line(self, buffer, start, end):
+        " apply the first rule of the table which matches the line from start to end of the buffer"
+        if self.stopped:
+            return
+        if end > start and buffer[end - 1] == "\r":
+            end = end - 1
+        for pattern, action, fields in self.table["rules"]:
+            match = pattern.match(buffer, start, end)
+            if match is None:
+                continue
+            groups = match.groupdict()
+            if action == "stop":
+                self.stopped = True
+            elif action == "hold":
+                self.held.update(groups)
+                self.held.update(fields)
+            elif action == "new" or self.record is None:
+                self.flush()
+                self.record = dict(self.held)
+                self.record.update([(name, value) for name, value in groups.items() if value is not None])
+            elif action == "update":
+                self.record.update([(name, value) for name, value in groups.items() if value is not None])
+            elif action == "first":
+                for name, value in groups.items():
+                    self.record.setdefault(name, value)
+            elif action == "append":
+                for name, value in groups.items():
+                    self.record[name] = ", ".join([item for item in (self.record.get(name), value) if item])
+            elif action == "repeat":
+                if [name for name in groups if self.record.get(name) is not None]:
+                    record = self.record
+                    self.flush()
+                    self.record = dict(record)
+                self.record.update(groups)
+            return
+
+    def flush(self):
+        " pass the record parsed to emit, or merge it with the record of its key"
+        record, self.record = self.record, None
+        if record is None:
+            return
+        if self.table["finish"] is not None:
+            record = self.table["finish"](record)
+        for name in self.table["integers"]:
+            if record.get(name) is not None:
+                record[name] = int(record[name])
+        record = dict([(name, record.get(name)) for name in self.table["columns"]])
+        key = self.table["key"]
+        if key is None:
+            self.emit(record)
+        elif record[key] in self.keyed:
+            self.keyed[record[key]].update([(name, value) for name, value in record.items() if value is not None])
+        else:
+            self.keyed[record[key]] = record
+
+    def close(self):
+        " parse the last line, the prompt, and pass the records still held to emit"
+        if self.buffer:
+            self.line(self.buffer, 0, len(self.buffer))
+            self.buffer = ""
+        self.flush()
+        for key in sorted(self.keyed):
+            self.emit(self.keyed[key])
+        self.keyed = {}
+
+
+
+def find_table(command):
+    " Return the table of the command, or None if it is not parsed."
+
+    command = " ".join((command or "").split())
+    for table in TABLES:
+        if table["command"].match(command):
+            return table
+    return None
+
+
+
+def parse_output(command, output):
+    " Return the records of the output of a command, a list of dicts, or None if the command is not parsed."
+
+    table = find_table(command)
+    if table is None:
+        return None
+    records = []
+    parser = TableParser(table, records.append)
+    parser.feed(output)
+    parser.close()
+    return records
+
+
+
+class Parser(object):
+    """ Parse the output of the commands with a table as it is written to the output file. The records
+        of each table are appended to a file of their own, <output file>_<table>.json, a line of JSON for
+        each record, or <output file>_<table>.csv. The output is written to the output file as it is.
+    """
+
+    def __init__(self, file_obj, prefix, host, form="json"):
+
+        self.file_obj = file_obj                           # the output file, or store, written to
+        self.prefix = prefix                               # path of the table files, less _<table>.<form>
+        self.host = host
+        self.form = form                                   # json or csv
+        self.parser = None                                 # the parser of the command being written
+        self.decoder = None
+        self.files = {}                                    # table: (file object, csv writer)
+        self.counts = {}                                   # table: records written
+
+    def write(self, data):
+        " write the output to the output file and parse it"
+        self.file_obj.write(data)
+        if self.parser is None:
+            return
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        self.parser.feed(data)
+
+    def begin(self, command, start=None):
+        " the output of the command is written next"
+        self.file_obj.begin(command, start)
+        table = find_table(command)
+        if table is not None:
+            self.parser = TableParser(table, lambda record: self.emit(table, record))
+            self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def end(self, status, end=None):
+        " the output of the command is complete"
+        if self.parser is not None:
+            self.parser.close()
+            self.parser = None
+        self.file_obj.end(status, end)
+
+    def emit(self, table, record):
+        " write a record to the file of its table"
+        name = table["name"]
+        if name not in self.files:
+            file_obj = open("%s_%s.%s" % (self.prefix, name, self.form), "a")
+            writer = None
+            if self.form == "csv":
+                writer = csv.writer(file_obj)
+                if file_obj.tell() == 0:                   # a new file, the columns head it
+                    writer.writerow(["host"] + table["columns"])
+            self.files[name] = (file_obj, writer)
+        file_obj, writer = self.files[name]
+        if writer is None:
+            file_obj.write("%s\n" % json.dumps(dict(record, host=self.host), sort_keys=True))
+        else:
+            writer.writerow([self.host] + ["" if record[column] is None else record[column]
+                                           for column in table["columns"]])
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def result(self):
+        " the keyword arguments for exit_json, the number of records of each table"
+        return dict(parsed=self.counts)
+
+    def close(self):
+        " close the output file and the table files"
+        if self.parser is not None:                        # the session ended before the command completed
+            self.end("timeout")
+        self.file_obj.close()
+        for file_obj, writer in self.files.values():
+            file_obj.close()
 
 # ---------------------------------------------------------------------------
 # IOS
@@ -105,8 +1362,20 @@ class IOS(object):
     USER = 1                                               # User EXEC mode
     ERROR = ["Error opening", "Invalid input"]             # Possible error messages from IOS
     COPY = ["[OK]", "bytes copied"]                        # Possible success criteria for copy command
-    TIMER = 3.0                                            # Paces the command and response from node, seconds
+    TIMEOUT = 60.0                                         # Time allowed for the prompt to return, seconds
+    CONNECT = 3.9                                          # Time allowed for the TCP connection and SSH login, seconds
+    SETTLE = 0.5                                           # Time allowed for a trailing prompt after login, seconds
     BUFFER_LEN = 4096                                      # length of buffer to receive in bytes
+    TAIL_LEN = 256                                         # length of output searched for a prompt
+    TYPEAHEAD = 512                                        # bytes of commands sent at once, within the input buffer
+    SPOOL_LEN = 1048576                                    # bytes of output held in memory before spilling to disk
+    PORT = 22                                              # SSH
+                                                           # Any prompt, '\r\nisr-2911-a>' or 'isr-2911-a(config)#'
+    PROMPT = re.compile(r"(^|[\r\n])(?P<hostname>[\w.\-@/:]+)(\([\w.\-]+\))?(?P<mode>[>#]) ?$")
+    CONFIRM = re.compile(r"(\[confirm\]|\]\?|[Pp]assword:) ?$")  # Prompts for a response, '[startup-config]?'
+    BOUNDARY = re.compile(r"(^|[\r\n])[\w.\-@/:]+(\([\w.\-]+\))?[>#]")  # A prompt, followed by the next command
+    MODIFIERS = ("include", "exclude", "begin", "section")  # output modifiers, '| include <regex>'
+    PIPES = "show privilege | include level"               # tests the node supports output modifiers
 
     def __init__(self, ssh_conn=None):
 
@@ -117,6 +1386,35 @@ class IOS(object):
         self.file_obj = None
         self.error_msg = None
         self.privilege = IOS.USER                          # <0-15>  User privilege level, default is 1
+        self.timeout = IOS.TIMEOUT
+        self.connect_timeout = IOS.CONNECT
+        self.unreachable = False                           # the connection or the SSH banner failed, not the login
+        self.broker = None                                 # Unix socket of cisco_ios_broker.py, optional
+        self.reused = False                                # attached to a session left logged in by a prior task
+        self.transport = "shell"                           # shell or exec
+        self.fallback = True                               # exec refused, fall back to the shell, not in a worker
+        self.channels = 1                                  # channels of the connection the commands are spread across
+        self.window = 1                                    # commands sent at once
+        self.maxbytes = 0                                  # limit of the output of each command, 0 is no limit
+        self.compress = False                              # gzip the output file
+        self.index = False                                 # write a side index of the output of each command
+        self.store = False                                 # write to a content-addressed store rather than a file
+        self.drift = False                                 # write the running configuration as a diff to a baseline
+        self.cache_directory = None                        # directory of the cache of command output, optional
+        self.cache_ttl = {}                                # command: seconds its output is cached
+        self.cache_size = None                             # bytes of the cache, default Cache.SIZE
+        self.cache = None                                  # the cache of the host, once the output file is open
+        self.parse = None                                  # json or csv, write the records of the commands parsed
+        self.filters = {}                                  # command: list of (modifier, regex) to filter its output
+        self.pipes = None                                  # the node supports output modifiers, None until tested
+        self.local = {}                                    # command sent: list of (modifier, regex) applied here
+        self.original = {}                                 # command sent: the command given, if a filter was added
+        self.partial = set()                               # commands sent whose output is filtered, by IOS or here
+        self.metrics = dict(phases={}, commands=[], bytes_sent=0, bytes_received=0)
+        self.tracer = None                                 # spans of the session, if profiling
+        self.sent = ""                                     # the last command, names the wait for its output
+        self.prompt = IOS.PROMPT                           # until we learn the hostname, match any prompt
+        self.boundary = IOS.BOUNDARY
         self.ssh_conn = ssh_conn                           # paramiko has two objects, a connect object
         self.ssh = None                                    # and an the exec object
                                                            # override default policy to reject all unknown servers
@@ -127,35 +1425,179 @@ class IOS(object):
     def __terminal(self, width=512, length=0):
         "Set terminal line parameters"
 
+        started = time.time()
         self.__send_command("terminal width %s\n" % width)
         self.__get_output()
         self.__send_command("terminal length %s\n" % length)
         self.__get_output()
+        self.timed("terminal", started)
         return
 
 
 
-    def __send_command(self, command, timer=TIMER):
+    def __send_command(self, command):
         """  Send data to the channel.
-             Commands need to be paced due to the RTT,
-             allow time for the remote host to respond.
+             The response is read by __get_output, which waits for the prompt.
         """
 
-        time.sleep((timer / 2))                            # Short nap before we get started
+        started = time.time()
         self.ssh.send(command)
-        time.sleep(timer)                                  # Allow time for the command output to return
+        self.metrics["bytes_sent"] = self.metrics["bytes_sent"] + len(command)
+        self.sent = command
+        self.trace(command, "send", started)
         return
 
 
 
-    def __get_output(self):
-        "  Receive data from the channel."
+    def timed(self, phase, started):
+        " Add the seconds since started to the phase of the session."
+
+        phases = self.metrics["phases"]
+        phases[phase] = round(phases.get(phase, 0.0) + time.time() - started, 4)
+        return
+
+
+
+    def trace(self, name, category, started, **args):
+        " Record a span of the session from started until now, if profiling. The enable password is not recorded."
+
+        if self.tracer is None:
+            return
+        name = name.strip() or "return"
+        if self.enable is not None and name == self.enable:
+            name = "********"
+        self.tracer.span(name, category, started, **args)
+        return
+
+
+
+    def __get_output(self, timeout=None, sink=None):
+        """  Receive data from the channel until the device prompt, or a prompt asking for
+             confirmation, ends the output. Give up when the timeout for the command expires.
+             With a sink, the output is written to it as it is received rather than returned.
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        output = []
+        tail = ""
+        received = 0
+        started = time.time()
+        deadline = started + timeout
+        while not self.prompt_found(tail):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self.ssh.settimeout(remaining)
+            try:
+                data = self.ssh.recv(IOS.BUFFER_LEN)
+            except socket.timeout:
+                continue
+            if not data:                                   # channel closed by the remote host
+                break
+            self.metrics["bytes_received"] = self.metrics["bytes_received"] + len(data)
+            if not isinstance(data, str):
+                data = decoder.decode(data)
+            tail = (tail + data)[-IOS.TAIL_LEN:]
+            received = received + len(data)
+            if sink is None:
+                output.append(data)
+            else:
+                sink.write(data)
+
+        self.trace(self.sent, "receive", started, bytes=received, prompt=self.prompt_found(tail))
+        return "".join(output)
+
+
+
+    def __get_outputs(self, batch, sink):
+        """  Receive the output of the commands sent at once, splitting it after each prompt,
+             'isr-2911-a#', which precedes the echo of the next command. The output of each
+             command is written to the sink as it is received, within the limit of bytes.
+             Give up when the timeout expires without another prompt.
+        """
+
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        pending = ""                                       # received, not yet written, may hold a prompt
+        count = len(batch)
+        found = 0
+        writer = CommandWriter(sink, self.maxbytes, batch[0], metrics=self.metrics["commands"])
+        started = time.time()
+        deadline = started + self.timeout
+        while found < count:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self.ssh.settimeout(remaining)
+            try:
+                data = self.ssh.recv(IOS.BUFFER_LEN)
+            except socket.timeout:
+                continue
+            if not data:                                   # channel closed by the remote host
+                break
+            self.metrics["bytes_received"] = self.metrics["bytes_received"] + len(data)
+            if not isinstance(data, str):
+                data = decoder.decode(data)
+            pending = pending + data
+            while found < count:
+                match = self.boundary.search(pending)
+                if match is None:
+                    break
+                writer.write(pending[:match.end()])
+                writer.close()
+                self.trace(batch[found], "receive", started, bytes=writer.received, prompt=True)
+                started = time.time()
+                pending = pending[match.end():]
+                found = found + 1
+                if found < count:
+                    writer = CommandWriter(sink, self.maxbytes, batch[found], metrics=self.metrics["commands"])
+                deadline = time.time() + self.timeout      # the timeout is for each command
+                                                           # write all but the lines a prompt may be split across
+            split = pending.rfind("\n", 0, len(pending) - IOS.TAIL_LEN)
+            if split > 0 and found < count:
+                writer.write(pending[:split])
+                pending = pending[split:]
+
+        if found < count:                                  # timed out, the rest belongs to the next command
+            writer.write(pending)
+            writer.close(False)
+            self.trace(batch[found], "receive", started, bytes=writer.received, prompt=False)
+            for item in batch[found + 1:]:
+                CommandWriter(sink, self.maxbytes, item, metrics=self.metrics["commands"]).close(False)
+        return
+
+
+
+    def prompt_found(self, output):
+        "  Test if the output ends with the device prompt or a confirmation prompt."
+
+        tail = output[-IOS.TAIL_LEN:]
+        return bool(self.prompt.search(tail) or IOS.CONFIRM.search(tail))
+
+
+
+    def privileged(self, output):
+        " test if the prompt ending the output is of privileged EXEC mode, '\r\nisr-2911-a#' or 'isr-2911-a# '"
+
+        match = self.prompt.search(output[-IOS.TAIL_LEN:])
+        return bool(match and match.group("mode") == "#")
 
-        output = ""
-        while self.ssh.recv_ready():
-            output = output + self.ssh.recv(IOS.BUFFER_LEN)
 
-        return output
+
+    def learn_prompt(self, output):
+        """ glean the hostname from the prompt ending the output, '\r\nisr-2911-a#', from now on
+            only that prompt, in any mode, ends the output of a command.
+        """
+
+        match = IOS.PROMPT.search(output[-IOS.TAIL_LEN:])
+        if match is None:
+            return None
+
+        hostname = match.group("hostname")
+        self.prompt = re.compile(r"(^|[\r\n])%s(\([\w.\-]+\))?(?P<mode>[>#]) ?$" % re.escape(hostname))
+        self.boundary = re.compile(r"(^|[\r\n])%s(\([\w.\-]+\))?[>#]" % re.escape(hostname))
+        return hostname
 
 
 
@@ -168,10 +1610,12 @@ class IOS(object):
 
         self.__send_command("\n")                          # send a return to get back a prompt
         output = self.__get_output()
-        if output[-1] == "#":
+        if self.privileged(output):
             self.privilege = 15
 
-        self.hostname = output[2:-1]                       # glean the hostname from '\r\nisr-2911-a#'
+        hostname = self.learn_prompt(output)             # glean the hostname from '\r\nisr-2911-a#'
+        if hostname:
+            self.hostname = hostname
         return self.privilege
 
 
@@ -179,11 +1623,16 @@ class IOS(object):
     def __clear_banners(self):
         """
            after logon, the buffer will contain the banner exec and MOTD text, clear it!
-           you might have both a banners, hit return once.
+           you might have both a banners, hit return once. The banners may already have
+           been followed by a prompt, so allow a moment for the prompt the return produces.
         """
 
+        started = time.time()
         self.__send_command("\n")
-        self.__get_output()
+        output = self.__get_output()
+        output = output + self.__get_output(timeout=IOS.SETTLE)
+        self.learn_prompt(output)
+        self.timed("banners", started)
         return
 
 
@@ -191,30 +1640,210 @@ class IOS(object):
     def login(self, hostname, user, password):
         " Logon the node, clear MOTD banners and set the terminal width and length"
 
+        if not self.connect(hostname, user, password):
+            return False
+
+        if self.ssh is None:                               # exec transport, no shell to set up
+            return True
+
+        if self.reused:                                    # banners cleared and terminal set by a prior task
+            self.__send_command("\n")
+            self.learn_prompt(self.__get_output())
+            return True
+
+        self.__clear_banners()
+        self.__terminal()
+        return True
+
+
+
+    def connect(self, hostname, user, password):
+        " Connect and authenticate to the node and start a shell, the banners are left unread."
+
         self.hostname = hostname
+        started = time.time()
+        if self.broker and self.attach(hostname, user, password):
+            self.timed("attach", started)
+            self.transport = "shell"                       # the broker relays a shell
+            return True
+
         try:
-            self.ssh_conn.connect(hostname, timeout=3.9, username=user, password=password)
+            started = time.time()
+            sock = socket.create_connection((hostname, IOS.PORT), self.connect_timeout)
+            self.timed("tcp_connect", started)
+            started = time.time()                          # SSH handshake and authentication
+            self.ssh_conn.connect(hostname, port=IOS.PORT, sock=sock, timeout=self.connect_timeout, username=user,
+                                  password=password)
+            self.timed("ssh_login", started)
         except paramiko.ssh_exception.AuthenticationException as msg:
             self.error_msg = str(msg)
             return False
-        except paramiko.ssh_exception.SSHException as msg:
+        except paramiko.ssh_exception.SSHException as msg:  # no SSH banner, or the handshake failed
             self.error_msg = str(msg)
+            self.unreachable = True
             return False
-        except:
-            self.error_msg = "No connection could be made to target machine"
+        except (socket.error, EOFError) as msg:             # refused, timed out, no route or not resolved
+            self.error_msg = "No connection could be made to target machine: %s" % msg
+            self.unreachable = True
             return False
 
+        if self.transport == "exec":                       # a channel is opened for each command
+            return True
+
+        started = time.time()
+        self.ssh = self.ssh_conn.invoke_shell()
+        self.timed("shell", started)
+        return True
+
+
+
+    def __exec(self, command, sink=None):
+        """ Run the command on its own exec channel and read until the channel closes. Returns None
+            if the node refuses exec channels. With a sink, the command and its output are written to
+            it as they are received, within the limit of bytes, rather than returned.
+        """
+
+        started = time.time()
+        try:
+            channel = self.ssh_conn.get_transport().open_session(timeout=self.timeout)
+            channel.exec_command(command)
+        except (paramiko.ssh_exception.SSHException, socket.error, EOFError):
+            return None
+        self.metrics["bytes_sent"] = self.metrics["bytes_sent"] + len(command)
+
+        if sink is not None:                               # no echo or prompt, mark where the output starts
+            writer = CommandWriter(sink, self.maxbytes, command, prompt=False, metrics=self.metrics["commands"])
+            sink.write("%s#%s\r\n" % (self.hostname, command))
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        output = []
+        tail = ""
+        received = 0
+        complete = False
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            channel.settimeout(remaining)
+            try:
+                data = channel.recv(IOS.BUFFER_LEN)
+            except socket.timeout:
+                continue
+            if not data:                                   # EOF, the command is complete
+                complete = True
+                break
+            self.metrics["bytes_received"] = self.metrics["bytes_received"] + len(data)
+            if not isinstance(data, str):
+                data = decoder.decode(data)
+            tail = (tail + data)[-1:]
+            received = received + len(data)
+            if sink is None:
+                output.append(data)
+            else:
+                writer.write(data)
+
+        channel.close()
+        self.trace(command, "exec", started, bytes=received, complete=complete)
+        if sink is not None:
+            if tail != "\n" and not writer.truncated:      # the marker ends the line
+                sink.write("\r\n")
+            writer.close(complete)
+        return "".join(output)
+
+
+
+    def __shell(self):
+        " Exec channels were refused, or enable mode is needed, fall back to the interactive shell."
+
+        self.transport = "shell"
         self.ssh = self.ssh_conn.invoke_shell()
         self.__clear_banners()
         self.__terminal()
+        return
+
+
+
+    def __worker(self):
+        " Return another IOS of the SSH connection, set up as this one, its commands timed in its metrics."
+
+        worker = IOS(self.ssh_conn)
+        worker.timeout = self.timeout
+        worker.maxbytes = self.maxbytes
+        worker.hostname = self.hostname
+        worker.metrics["commands"] = self.metrics["commands"]
+        worker.tracer = self.tracer
+        worker.cache = self.cache
+        worker.local = self.local
+        return worker
+
+
+
+    def __open_channel(self):
+        """ Open another shell on the SSH connection, set up as the first. Returns None if the
+            node refuses another channel or enable mode.
+        """
+
+        worker = self.__worker()
+        try:
+            worker.ssh = self.ssh_conn.invoke_shell()
+        except (paramiko.ssh_exception.SSHException, socket.error, EOFError):
+            return None
+
+        worker.__clear_banners()
+        worker.__terminal()
+        if self.enable is not None and not worker.enable_mode(self.enable):
+            worker.ssh.close()
+            return None
+        return worker
+
+
+
+    def attach(self, hostname, user, password):
+        """ Attach to the session cisco_ios_broker.py holds for the host and user, rather than
+            login. Returns False, to login directly, if the broker is not running, the session
+            is in use by another task or the broker could not login.
+        """
+
+        request = dict(host=hostname, port=IOS.PORT, username=user, password=password, timeout=self.connect_timeout)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.broker)
+            sock.sendall(("%s\n" % json.dumps(request)).encode("utf-8"))
+            line = b""
+            while not line.endswith(b"\n"):               # byte by byte, the shell output follows
+                data = sock.recv(1)
+                if not data:
+                    break
+                line = line + data
+            reply = json.loads(line.decode("utf-8"))
+        except (socket.error, ValueError) as msg:
+            sock.close()
+            self.error_msg = "Broker %s: %s" % (self.broker, msg)
+            return False
+
+        if reply.get("status") != "ok":
+            sock.close()
+            self.error_msg = reply.get("msg", "Broker session is %s" % reply.get("status"))
+            return False
+
+        self.reused = reply.get("reused", False)
+        self.ssh = BrokerChannel(sock)
         return True
 
 
 
     def logoff(self):
         "  Returns True or False"
+        started = time.time()
         self.close_output_file()
+        if self.ssh is None:                               # exec transport, or the login failed
+            self.ssh_conn.close()
+            self.timed("logoff", started)
+            return True
         self.ssh.close()
+        self.ssh_conn.close()
+        self.timed("logoff", started)
         return self.ssh.closed
 
 
@@ -231,32 +1860,181 @@ class IOS(object):
             self.debug = True
 
 
-    def enable_mode(self, enable):
-        """ Enter enable mode if required. As it is optional, Ansible will pass the value as None (type 'NoneType') 
-            test if not provided and exit true, assuming that there are no commands which require enable mode to issue.
-            Test if we are already in enable mode and also return True, otherwise, provide the enable password.
-        """ 
-        if enable is None:
-            return True
 
-        self.enable = enable
-        if self.__determine_privilege_level() == IOS.ENABLE:
+    def set_timeout(self, value):
+        "set the seconds to wait for the prompt after each command, could be a NoneType if not specified."
+        if value is not None:
+            self.timeout = float(value)
+
+
+
+    def set_connect_timeout(self, value):
+        "set the seconds allowed for the TCP connection and SSH login, could be a NoneType if not specified."
+        if value is not None:
+            self.connect_timeout = float(value)
+
+
+
+    def set_broker(self, value):
+        "set the path of the broker socket, could be a NoneType if not specified."
+        self.broker = value
+
+
+
+    def set_transport(self, value):
+        "set the transport, shell or exec, could be a NoneType if not specified."
+        if value is not None:
+            self.transport = value
+
+
+
+    def set_channels(self, value):
+        "set the number of channels to spread the commands across, could be a NoneType if not specified."
+        if value is not None:
+            self.channels = max(1, int(value))
+
+
+
+    def set_window(self, value):
+        "set the number of commands sent at once, could be a NoneType if not specified."
+        if value is not None:
+            self.window = max(1, int(value))
+
+
+
+    def set_maxbytes(self, value):
+        "set the limit of the output of each command, could be a NoneType if not specified."
+        if value is not None:
+            self.maxbytes = max(0, int(value))
+
+
+
+    def set_compress(self, value):
+        "set if the output file is compressed, could be a NoneType if not specified."
+        self.compress = str(value) in ("true", "True", "on", "On", "yes", "Yes")
+
+
+
+    def set_index(self, value):
+        "set if a side index of the output of each command is written, could be a NoneType if not specified."
+        self.index = str(value) in ("true", "True", "on", "On", "yes", "Yes")
+
+
+
+    def set_profile(self, value):
+        "set the file of trace events of the session, could be a NoneType if not specified."
+        if value:
+            self.tracer = Tracer(value)
+
+
+
+    def set_store(self, value):
+        "set if the output is written to a content-addressed store, could be a NoneType if not specified."
+        self.store = str(value) in ("true", "True", "on", "On", "yes", "Yes")
+
+
+
+    def set_drift(self, value):
+        "set if the running configuration is compared with a baseline, could be a NoneType if not specified."
+        self.drift = str(value) in ("true", "True", "on", "On", "yes", "Yes")
+
+
+
+    def set_cache(self, value):
+        "set the directory of the cache of command output, could be a NoneType if not specified."
+        self.cache_directory = value or None
+
+
+
+    def set_cache_ttl(self, value):
+        "set the seconds the output of commands is cached, a dict or 'command=seconds' strings, could be a NoneType."
+        if isinstance(value, dict):
+            value = value.items()
+        elif value is not None:
+            value = [item.rsplit("=", 1) for item in value]
+        for command, seconds in value or []:
+            self.cache_ttl[" ".join(command.split())] = float(seconds)
+
+
+
+    def set_cache_size(self, value):
+        "set the limit of the size of the cache in bytes, could be a NoneType if not specified."
+        if value:
+            self.cache_size = int(value)
+
+
+
+    def set_parse(self, value):
+        "set the format of the records of the commands parsed, json or csv, could be a NoneType if not specified."
+        if value in ("json", "csv"):
+            self.parse = value
+
+
+
+    def set_filters(self, value):
+        """set the filters of the output of commands, a dict of command: 'include <regex>' or a list of them,
+           or 'command=include <regex>' strings, the modifier may be abbreviated, could be a NoneType."""
+        if isinstance(value, dict):
+            value = value.items()
+        elif value is not None:
+            value = [item.split("=", 1) for item in value if "=" in item]
+        for command, filters in value or []:
+            if not isinstance(filters, list):
+                filters = [filters]
+            for item in filters:
+                words = item.split(None, 1)
+                kinds = [kind for kind in IOS.MODIFIERS if words and kind.startswith(words[0].lower())]
+                if len(words) == 2 and len(kinds) == 1:
+                    self.filters.setdefault(" ".join(command.split()), []).append((kinds[0], words[1]))
+
+
+
+    def enable_mode(self, enable):
+        """ Enter enable mode if required. As it is optional, Ansible will pass the value as None (type 'NoneType') 
+            test if not provided and exit true, assuming that there are no commands which require enable mode to issue.
+            Test if we are already in enable mode and also return True, otherwise, provide the enable password.
+        """ 
+        if enable is None:
+            return True
+
+        started = time.time()
+        success = self.__enable_mode(enable)
+        self.timed("enable", started)
+        return success
+
+
+
+    def __enable_mode(self, enable):
+        " Enter enable mode with the password, from the exec transport or the shell."
+
+        self.enable = enable
+        if self.transport == "exec":                       # privilege level 15 at login, or use the shell
+            output = self.__exec("show privilege")
+            if output is not None and "level is 15" in output:
+                self.privilege = IOS.ENABLE
+                return True
+            self.__shell()
+
+        if self.__determine_privilege_level() == IOS.ENABLE:
             return True
 
         self.__send_command("enable\n")                    # send command
-        self.__send_command("%s\n" % self.enable)          # send enable password
-        self.__send_command("\n")                          # send return
         output = self.__get_output()
-        if "Access denied" in output:
+        if IOS.CONFIRM.search(output[-IOS.TAIL_LEN:]):      # 'Password:'
+            self.__send_command("%s\n" % self.enable)      # send enable password
+            output = self.__get_output()
+        if "Access denied" in output or not self.privileged(output):
             return False
 
+        self.privilege = IOS.ENABLE
         return True
 
 
 
     def close_output_file(self):
         " Close the output file."
-        self.file_obj.close()
+        if self.file_obj:
+            self.file_obj.close()
         return
 
 
@@ -266,25 +2044,1073 @@ class IOS(object):
         if destination_directory[-1] == "/":
             destination_directory = destination_directory[:-1]
         self.output_file = "%s/%s_%s_%s.log" % (destination_directory, self.output_file, hostname, time.strftime("%j"))
+        prefix = self.output_file[:-len(".log")]           # of the files of the records parsed
         try:
-            self.file_obj = open(self.output_file, "a")
+            if self.store:
+                self.file_obj = Store(destination_directory, hostname)
+                self.output_file = self.file_obj.path
+            else:
+                if self.compress:
+                    self.output_file = "%s.gz" % self.output_file
+                self.file_obj = OutputFile(self.output_file, self.compress, self.index)
+            if self.drift:
+                self.file_obj = Drift(self.file_obj, destination_directory, hostname, self.partial)
+            if self.parse:
+                self.file_obj = Parser(self.file_obj, prefix, hostname, self.parse)
+            if self.cache_directory and self.cache_ttl:
+                self.file_obj = Cache(self.file_obj, self.cache_directory, hostname, self.cache_ttl, self.cache_size,
+                                      self.partial)
+                self.cache = self.file_obj
         except:
             return False
         return True
 
 
 
+    def sink_result(self):
+        " Return the keyword arguments for exit_json of the drift and the tables parsed."
+
+        result = {}
+        sink = self.file_obj
+        while isinstance(sink, (Drift, Parser, Cache)):
+            if not isinstance(sink, Cache):
+                result.update(sink.result())
+            sink = sink.file_obj
+        return result
+
+
+
+    def command_status(self):
+        " Return the status of each command issued, by the command as given."
+
+        return dict([(self.original.get(item["command"], item["command"]), item["status"])
+                     for item in self.metrics["commands"]])
+
+
+
+    def write_header(self):
+        " Mark the start of the output of this session in the output file."
+        self.file_obj.write(" ### %s %s ###\r\n" % (time.asctime(), self.hostname))
+        return
+
+
+
     def issue_commands(self, commands):
         "the playbook as provided us a list of commands to issue against the device."
-        self.file_obj.write(" ### %s %s ###\r\n" % (time.asctime(), self.hostname))
-        for item in commands:
-            self.__send_command("%s\n" % item)
-            output = self.__get_output()
-            self.file_obj.write(output)
+        started = time.time()
+        self.write_header()
+        if self.cache is not None:                         # the uptime tells the cache if the device has reloaded
+            self.cache.validate(self.__uptime())
+        if self.pipes is None and self.filtered(commands):
+            self.pipes = self.__pipes()
+        commands = self.filter_commands(commands)
+        if len(commands) > 1 and (self.channels > 1 or self.window > 1):
+            self.__capture(commands[:1], self.file_obj)    # the first command settles the transport
+            commands = commands[1:]
+
+        batches = self.__batches(commands)
+        if self.channels > 1 and len(batches) > 1:
+            self.__parallel(batches)
+        else:
+            for batch in batches:
+                self.__capture(batch, self.file_obj)
+        self.timed("commands", started)
         return True
 
 
 
+    def __uptime(self):
+        " Issue Cache.PROBE and return its output, the uptime of the device."
+
+        started = time.time()
+        output = self.__exec(Cache.PROBE) if self.transport == "exec" else None
+        if output is None:
+            if self.transport == "exec":
+                self.__shell()                             # exec channels refused
+            self.__send_command("%s\n" % Cache.PROBE)
+            output = self.__get_output()
+        self.timed("cache", started)
+        return output
+
+
+
+    def __pipes(self):
+        " Issue IOS.PIPES and return if the node supports output modifiers."
+
+        output = self.__exec(IOS.PIPES) if self.transport == "exec" else None
+        if output is None:
+            if self.transport == "exec":
+                self.__shell()                             # exec channels refused
+            self.__send_command("%s\n" % IOS.PIPES)
+            output = self.__get_output()
+        return "Invalid input" not in output
+
+
+
+    def filtered(self, commands):
+        " Return the commands which have filters."
+        return [item for item in commands if " ".join(item.split()) in self.filters]
+
+
+
+    def filter_commands(self, commands):
+        """ Return the commands to send, the first filter of a command is added as an output modifier,
+            'show running-config | section interface', if the node supports them. The other filters, or
+            all of them, are applied here to the output of the command sent.
+        """
+
+        sent = []
+        for item in commands:
+            filters = self.filters.get(" ".join(item.split()), [])
+            if filters and self.pipes:
+                self.original["%s | %s %s" % (item, filters[0][0], filters[0][1])] = item
+                item = "%s | %s %s" % (item, filters[0][0], filters[0][1])
+                filters = filters[1:]
+                self.partial.add(" ".join(item.split()))   # not the whole output, for the drift or the cache
+            if filters:
+                self.local[item] = filters
+                self.partial.add(" ".join(item.split()))
+            sent.append(item)
+        return sent
+
+
+
+    def local_filter(self, command, sink):
+        " Return the sink wrapped in the filters of the command applied here, the first is applied first."
+
+        for kind, pattern in reversed(self.local.get(command, [])):
+            sink = LocalFilter(sink, kind, pattern)
+        return sink
+
+
+
+    def __batches(self, commands):
+        """ Group the commands into windows, sent to the shell at once. A window is at most
+            self.window commands which together fit in the device's typeahead buffer. A command
+            whose output is cached, or filtered here, is a window of its own.
+        """
+
+        if self.transport == "exec" or self.window == 1:
+            return [[item] for item in commands]
+
+        batches = []
+        for item in commands:
+            size = len(item) + 1
+            if item in self.local or (self.cache is not None and self.cache.lookup(item) is not None):
+                batches.append([item])
+                batch_size = IOS.TYPEAHEAD                 # the next command starts a window
+            elif batches and len(batches[-1]) < self.window and batch_size + size <= IOS.TYPEAHEAD:
+                batches[-1].append(item)
+                batch_size = batch_size + size
+            else:
+                batches.append([item])
+                batch_size = size
+        return batches
+
+
+
+    def __capture(self, batch, sink):
+        """ Issue a window of commands and write their output to the sink, from exec channels or the shell.
+            Returns the commands not issued if exec channels are refused and this is a worker, which does not
+            fall back to the shell.
+        """
+
+        if len(batch) == 1 and self.cache is not None and self.cache.replay(batch[0], sink, self.metrics["commands"]):
+            return
+
+        if self.transport == "exec":
+            while batch and self.__exec(batch[0], self.local_filter(batch[0], sink)) is not None:
+                batch = batch[1:]
+            if not batch:
+                return
+            if not self.fallback:                          # the shell is left to the thread of the node
+                return batch
+            self.__shell()                                 # exec channels refused
+
+        if len(batch) > 1:
+            self.__send_command("".join(["%s\n" % item for item in batch]))
+            self.__get_outputs(batch, sink)
+            return
+
+        writer = CommandWriter(self.local_filter(batch[0], sink), self.maxbytes, batch[0],
+                               metrics=self.metrics["commands"])
+        self.__send_command("%s\n" % batch[0])
+        self.__get_output(sink=writer)
+        writer.close(self.prompt_found(writer.tail))
+        return
+
+
+
+    def __parallel(self, batches):
+        """ Spread the windows of commands across up to self.channels channels of the SSH connection,
+            a thread for each. The output is written in the order of the commands as it completes. The
+            windows an exec worker is refused are issued after, by this node alone, in the shell if need be.
+        """
+
+        count = min(self.channels, len(batches))
+        if self.transport == "exec":                       # exec channels are opened per command, by workers
+            workers = [self.__worker() for number in range(count)]
+            for worker in workers:
+                worker.transport = "exec"
+                worker.fallback = False
+        elif self.ssh_conn.get_transport() is not None:    # additional shells are opened by their threads
+            workers = [self] + [None] * (count - 1)
+        else:                                              # relayed by a broker, only the one shell
+            workers = [self]
+        opened = []
+
+        pending = queue.Queue()
+        for index, batch in enumerate(batches):
+            pending.put((index, batch, Spool()))
+        results = {}                                       # spooled output, by index of the window
+        written = [0]                                      # index of the next output to write
+        lock = threading.Lock()
+
+        def run(worker):
+            " issue windows of commands on the worker's channel until none remain"
+            if worker is None:
+                worker = self.__open_channel()
+                if worker is None:                         # the node permits no more channels
+                    return
+            if worker is not self:
+                opened.append(worker)
+            while True:
+                try:
+                    index, batch, spool = pending.get_nowait()
+                except queue.Empty:
+                    return
+                batch = worker.__capture(batch, spool)
+                if batch:                                  # refused, the rest left for this node
+                    pending.put((index, batch, spool))
+                    return
+                with lock:
+                    results[index] = spool
+                    while written[0] in results:
+                        results.pop(written[0]).replay(self.file_obj)
+                        written[0] = written[0] + 1
+
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        run(self)                                          # the windows refused by the exec workers
+
+        for worker in opened:
+            if worker.ssh is not None:
+                worker.ssh.close()
+            for counter in ("bytes_sent", "bytes_received"):
+                self.metrics[counter] = self.metrics[counter] + worker.metrics[counter]
+        return
+
+
+
+# ---------------------------------------------------------------------------
+# CAPTURE
+# ---------------------------------------------------------------------------
+
+def capture(params, state=None):
+    """ Login one host, issue the commands and write the output file. Returns a tuple of success
+        and the keyword arguments for exit_json or fail_json. Resuming, the commands complete in
+        the checkpoint, or in the state read from it, are not issued.
+    """
+
+    if params.get("circuit") and Circuit(params["circuit"], params["host"]).is_open():
+        return False, dict(msg=Circuit(params["circuit"], params["host"]).msg())
+    commands = resume_commands(params, state)
+    if params.get("resume"):
+        if not commands:
+            return True, dict(content="Complete in the checkpoint.", skipped=len(params["commands"]))
+        params = dict(params, commands=commands, skipped=len(params["commands"]) - len(commands))
+
+    node = IOS(paramiko.SSHClient())
+    node.set_debug(params.get("debug"))
+    node.set_timeout(params.get("timeout"))
+    node.set_connect_timeout(params.get("connect_timeout"))
+    node.set_broker(params.get("broker"))
+    node.set_transport(params.get("transport"))
+    node.set_channels(params.get("channels"))
+    node.set_window(params.get("window"))
+    node.set_maxbytes(params.get("maxbytes"))
+    node.set_compress(params.get("compress"))
+    node.set_index(params.get("index"))
+    node.set_store(params.get("store"))
+    node.set_profile(params.get("profile"))
+    node.set_drift(params.get("drift"))
+    node.set_cache(params.get("cache"))
+    node.set_cache_ttl(params.get("cache_ttl"))
+    node.set_cache_size(params.get("cache_size"))
+    node.set_parse(params.get("parse"))
+    node.set_filters(params.get("filters"))
+
+    started = time.time()
+    success, result = issue(node, params)
+    result.update(node.sink_result())
+    write_checkpoint(params.get("checkpoint"), params["host"], success, result, node.command_status())
+    record_circuit(params.get("circuit"), params["host"], node)
+    if params.get("resume"):
+        result["skipped"] = params["skipped"]
+    if node.tracer is not None:
+        node.tracer.close(params["host"])
+    node.metrics["elapsed"] = round(time.time() - started, 4)
+    result["metrics"] = node.metrics
+    write_metrics(params.get("metrics"), "cisco_ios_show", params["host"], success, node.metrics)
+    return success, result
+
+
+
+def issue(node, params):
+    " Open the output file, login, enter enable mode and issue the commands. Returns as capture."
+
+    if node.open_output_file(params["dest"], params["host"]):
+        pass
+    else:
+        return False, dict(msg="Error opening output file.")
+
+                                                           # LOGIN
+    if node.login(params["host"], params["username"], params["password"]):
+        if node.enable_mode((params.get("enablepw"))):     # ENABLE MODE
+            pass
+        else:
+            node.logoff()
+            return False, dict(msg="Enable password specified and an error occured entering enable mode.")
+
+        if node.issue_commands(params["commands"]):        # ISSUE COMMANDS
+            node.logoff()
+            return True, dict(content="Success.")
+        else:
+            node.logoff()
+            return False, dict(msg="Error issuing commands.")
+    else:
+        node.close_output_file()
+        return False, dict(msg=node.get_error_msg())
+
+# ---------------------------------------------------------------------------
+# CHECKPOINT
+# ---------------------------------------------------------------------------
+
+COMPLETE = ("ok", "truncated", "cached")                   # status of a command which is not issued on resume
+
+def write_checkpoint(path, host, success, result, commands):
+    """ Append the status of a host and of each command issued to the checkpoint of the run, a file of
+        JSON lines, once its output file is closed. A host missing from the checkpoint was not reached.
+    """
+
+    if not path:
+        return
+    line = json.dumps(dict(host=host, status="ok" if success else "failed", msg=result.get("msg"),
+                           time=round(time.time(), 3), commands=commands), sort_keys=True)
+    with open(path, "a") as file_obj:
+        file_obj.write("%s\n" % line)                      # one write, the hosts of concurrent runs do not mix
+    return
+
+
+
+def read_checkpoint(path):
+    " Return the last status of each command of each host in the checkpoint, {host: {command: status}}."
+
+    state = {}
+    if not path or not os.path.exists(path):
+        return state
+    with open(path) as file_obj:
+        for line in file_obj:
+            try:
+                entry = json.loads(line)
+            except ValueError:                             # the last line of a run which was killed
+                continue
+            commands = state.setdefault(entry["host"], {})
+            for command, status in entry["commands"].items():
+                commands[" ".join(command.split())] = status
+    return state
+
+
+
+def resume_commands(params, state=None):
+    " Return the commands of the host to issue, resuming those which are not complete in the checkpoint."
+
+    if not params.get("resume"):
+        return params["commands"]
+    if state is None:
+        state = read_checkpoint(params.get("checkpoint"))
+    status = state.get(params["host"], {})
+    return [item for item in params["commands"] if status.get(" ".join(item.split())) not in COMPLETE]
+
+# ---------------------------------------------------------------------------
+# PREFLIGHT
+# ---------------------------------------------------------------------------
+
+PROBES = 512                                               # default number of pre-flight probes open at a time
+
+class Probe(object):
+    """ The protocol of a pre-flight probe of a host, read the SSH banner, 'SSH-2.0-Cisco-1.25', and close.
+    """
+
+    def __init__(self, done):
+
+        self.done = done                                   # future, the status of the probe
+        self.transport = None
+        self.data = b""
+
+    def connection_made(self, transport):
+        " connected, the server sends its banner first"
+        self.transport = transport
+
+    def data_received(self, data):
+        " the banner is the first line"
+        self.data = self.data + data
+        if b"\n" in self.data or len(self.data) > 255:
+            self.transport.close()
+
+    def eof_received(self):
+        " the server closed the connection, close it"
+        return False
+
+    def connection_lost(self, exc):
+        " the status of the probe, ok if the banner was received"
+        if not self.done.done():
+            self.done.set_result("ok" if self.data.startswith(b"SSH-") else "no SSH banner")
+
+
+
+class Circuit(object):
+    """ The circuit breaker of a host, kept across runs as <directory>/<host>.json. When the host cannot
+        be reached the circuit opens, and the host is not tried again until it expires, BASE seconds after
+        the first failure, doubling with each failure after, up to LIMIT seconds. A login closes it.
+    """
+
+    BASE = 300.0
+    LIMIT = 86400.0
+
+    def __init__(self, directory, host):
+
+        self.directory = directory
+        self.path = "%s/%s.json" % (directory, host)
+        self.state = dict(failures=0, until=0.0, msg=None)
+        try:
+            with open(self.path) as file_obj:
+                self.state.update(json.load(file_obj))
+        except (IOError, OSError, ValueError):             # never failed, or written partially
+            pass
+
+    def is_open(self):
+        " test if the host is not to be tried"
+        return time.time() < self.state["until"]
+
+    def msg(self):
+        " the reason the host is not tried"
+        return "Not tried after %s failures until %s: %s" % (self.state["failures"], time.asctime(
+            time.localtime(self.state["until"])), self.state["msg"])
+
+    def failure(self, msg):
+        " the host could not be reached, open the circuit for twice as long as the last time"
+        self.state["failures"] = self.state["failures"] + 1
+        self.state["until"] = round(time.time() + min(Circuit.BASE * 2 ** (self.state["failures"] - 1),
+                                                      Circuit.LIMIT), 3)
+        self.state["msg"] = msg
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:                                # created by another host of the fleet
+                pass
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "w") as file_obj:
+            file_obj.write(json.dumps(self.state, sort_keys=True))
+        os.rename(temporary, self.path)
+
+    def success(self):
+        " the host was reached, close the circuit"
+        if self.state["failures"] and os.path.exists(self.path):
+            os.remove(self.path)
+        self.state = dict(failures=0, until=0.0, msg=None)
+
+
+
+def record_circuit(directory, host, node):
+    " Open or close the circuit of the host after a run, a run which failed to login for another reason leaves it."
+
+    if not directory:
+        return
+    if node.unreachable:
+        Circuit(directory, host).failure(node.get_error_msg())
+    elif "ssh_login" in node.metrics["phases"] or "attach" in node.metrics["phases"]:
+        Circuit(directory, host).success()
+    return
+
+
+
+def sweep(hosts, port=22, timeout=IOS.CONNECT, limit=PROBES):
+    """ Probe the SSH port of every host at once with asyncio, at most limit connections open at a time,
+        each given timeout seconds to connect and send the SSH banner. Returns {host: status}, the status
+        is ok, or why the host is not reachable.
+    """
+
+    loop = asyncio.new_event_loop()
+    pending = list(hosts)
+    results = {}
+    finished = loop.create_future()
+
+    def start():
+        " probe the next host"
+        host = pending.pop(0)
+        protocol = Probe(loop.create_future())
+
+        def done(status):
+            " record the status of the host, close the connection and probe the next"
+            if host in results:
+                return
+            results[host] = status
+            timer.cancel()
+            connection.cancel()                            # if still connecting
+            if protocol.transport is not None:
+                protocol.transport.close()
+            if pending:
+                start()
+            elif len(results) == len(hosts):
+                finished.set_result(True)
+
+        def connected(future):
+            " wait for the banner once connected"
+            if future.cancelled():
+                return
+            if future.exception() is not None:             # refused, no route or not resolved
+                done("%s: %s" % (type(future.exception()).__name__, future.exception()))
+                return
+            protocol.done.add_done_callback(lambda banner: done(banner.result()))
+
+        connection = asyncio.ensure_future(loop.create_connection(lambda: protocol, host, port), loop=loop)
+        connection.add_done_callback(connected)
+        timer = loop.call_later(timeout, done, "timeout")
+
+    try:
+        for count in range(min(limit, len(hosts))):
+            start()
+        if hosts:
+            loop.run_until_complete(finished)
+    finally:
+        loop.close()
+    return results
+
+
+
+def preflight(hosts, params):
+    """ Drop the hosts whose circuit is open and, if requested, those which fail the pre-flight sweep.
+        Returns the hosts to capture and the results of those dropped, failed.
+    """
+
+    results = {}
+    if params.get("circuit"):
+        for host in hosts:
+            circuit = Circuit(params["circuit"], host)
+            if circuit.is_open():
+                results[host] = dict(msg=circuit.msg(), failed=True)
+        hosts = [host for host in hosts if host not in results]
+
+    if params.get("preflight") and hosts:
+        started = time.time()
+        status = sweep(hosts, IOS.PORT, float(params.get("connect_timeout") or IOS.CONNECT),
+                       params.get("probes") or PROBES)
+        for host in hosts:
+            if status[host] != "ok":
+                msg = "Pre-flight %s port %s: %s" % (host, IOS.PORT, status[host])
+                results[host] = dict(msg=msg, failed=True, metrics=dict(preflight=round(time.time() - started, 4)))
+                if params.get("circuit"):
+                    Circuit(params["circuit"], host).failure(msg)
+        hosts = [host for host in hosts if host not in results]
+    return hosts, results
+
+# ---------------------------------------------------------------------------
+# FLEET
+# ---------------------------------------------------------------------------
+
+FORKS = 50                                                 # default number of devices captured at a time
+
+def read_commands(filename):
+    " Return the commands of a file, one per line, ignoring blank lines."
+
+    with open(filename) as commands:
+        return [line.strip() for line in commands if line.strip()]
+
+
+
+def fleet(hosts, params, forks=FORKS):
+    """ Capture each host in a pool of at most forks threads, all sharing the same parameters
+        other than the host. Returns a summary of the success or failure of each host.
+    """
+
+    started = time.time()
+    hosts, results = preflight(hosts, params)
+    pending = queue.Queue()
+    for host in hosts:
+        pending.put(host)
+    state = read_checkpoint(params.get("checkpoint")) if params.get("resume") else None
+
+    def worker():
+        " capture hosts until none remain"
+        while True:
+            try:
+                host = pending.get_nowait()
+            except queue.Empty:
+                return
+            host_params = dict(params, host=host)
+            try:
+                success, result = capture(host_params, state)
+            except Exception as msg:                       # a session dropped part way through
+                success, result = False, dict(msg="%s: %s" % (type(msg).__name__, msg))
+            result["failed"] = not success
+            results[host] = result
+
+    threads = [threading.Thread(target=worker) for count in range(max(1, min(forks, len(hosts))))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize(results, started)
+
+
+
+def summarize(results, started):
+    " The summary of a fleet run, the result of each host and the count of hosts which succeeded and failed."
+
+    failed = len([host for host in results if results[host]["failed"]])
+    return dict(hosts=results, ok=len(results) - failed, failed=failed, elapsed=round(time.time() - started, 3))
+
+
+
+# ---------------------------------------------------------------------------
+# EVENT LOOP
+# ---------------------------------------------------------------------------
+
+LOGINS = 16                                                # default number of blocking SSH logins at a time
+TICK = 0.1                                                 # seconds between checks for expired timeouts
+
+class Session(IOS):
+    """ One host of the event loop, a state machine advanced only when its channel has data, or
+        when the timeout of the state expires. The states follow IOS.login, enable_mode and
+        issue_commands: banner, settle, width, length, privilege, enable, password, uptime, pipes, command.
+    """
+
+    PHASES = dict(banner="banners", settle="banners", width="terminal", length="terminal", privilege="enable",
+                  enable="enable", password="enable", uptime="cache", pipes="commands", command="commands")
+
+    def __init__(self, params):
+
+        IOS.__init__(self, paramiko.SSHClient())
+        self.params = params
+        self.set_debug(params.get("debug"))
+        self.set_timeout(params.get("timeout"))
+        self.set_connect_timeout(params.get("connect_timeout"))
+        self.set_broker(params.get("broker"))
+        self.set_maxbytes(params.get("maxbytes"))
+        self.set_compress(params.get("compress"))
+        self.set_index(params.get("index"))
+        self.set_store(params.get("store"))
+        self.set_profile(params.get("profile"))
+        self.set_drift(params.get("drift"))
+        self.set_cache(params.get("cache"))
+        self.set_cache_ttl(params.get("cache_ttl"))
+        self.set_cache_size(params.get("cache_size"))
+        self.set_parse(params.get("parse"))
+        self.set_filters(params.get("filters"))
+        self.enable = params.get("enablepw")               # not recorded by the trace
+        self.writer = None                                 # writes the output of the current command
+        self.commands = list(params["commands"])
+        self.state = "login"
+        self.output = []                                   # output of the current state, less for commands
+        self.tail = ""                                     # end of the output, searched for the prompt
+        self.deadline = None
+        self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self.result = None                                 # tuple of success and the result, once finished
+        self.phase = None                                  # phase of the metrics the state belongs to
+        self.started = time.time()
+        self.phase_started = None
+        self.sent_at = None                                # time of the command of the state
+
+
+
+    def login_blocking(self):
+        " Connect, authenticate and start the shell, run in the pool of login threads."
+
+        try:
+            if not self.connect(self.params["host"], self.params["username"], self.params["password"]):
+                self.finish(False, msg=self.get_error_msg())
+        except Exception as msg:
+            self.finish(False, msg="%s: %s" % (type(msg).__name__, msg))
+        return
+
+
+
+    def expect(self, command, state, timeout=None):
+        " Send the command, the output is collected until the prompt, or timeout, then passed to the state."
+
+        if Session.PHASES.get(state) != self.phase:
+            self.end_phase()
+            self.phase, self.phase_started = Session.PHASES.get(state), time.time()
+        self.state = state
+        self.output = []
+        self.tail = ""
+        self.sent_at = time.time()
+        self.deadline = self.sent_at + (self.timeout if timeout is None else timeout)
+        if command is not None:
+            self.ssh.send(command)
+            self.metrics["bytes_sent"] = self.metrics["bytes_sent"] + len(command)
+            self.sent = command
+            self.trace(command, "send", self.sent_at)
+        return
+
+
+
+    def end_phase(self):
+        " Add the seconds of the phase which has ended to the metrics."
+
+        if self.phase is not None:
+            self.timed(self.phase, self.phase_started)
+            self.phase = None
+        return
+
+
+
+    def receive(self):
+        " The channel is readable, collect the output and advance the state at the prompt."
+
+        data = self.ssh.recv(IOS.BUFFER_LEN)
+        if not data:
+            self.finish(False, msg="Channel closed by the remote host.")
+            return
+        self.metrics["bytes_received"] = self.metrics["bytes_received"] + len(data)
+        if not isinstance(data, str):
+            data = self.decoder.decode(data)
+        if self.state == "command":                        # command output goes straight to the file
+            self.writer.write(data)
+        else:
+            self.output.append(data)
+        self.tail = (self.tail + data)[-IOS.TAIL_LEN:]
+        if self.prompt_found(self.tail):
+            self.advance()
+        return
+
+
+
+    def expired(self, now):
+        " Advance the state with the output collected so far, when the timeout of the state has expired."
+
+        if self.result is None and self.deadline is not None and now > self.deadline:
+            self.advance()
+        return
+
+
+
+    def advance(self):
+        " The output of the state is complete, send the next command."
+
+        self.trace(self.sent, "receive", self.sent_at, state=self.state, prompt=self.prompt_found(self.tail))
+        output = "".join(self.output)
+        if self.state == "banner":                         # the return may produce a second prompt
+            self.expect(None, "settle", timeout=IOS.SETTLE)
+            self.output = [output]
+        elif self.state == "settle" and self.reused:       # banners cleared and terminal set by a prior task
+            self.learn_prompt(output)
+            self.advance_to_privilege()
+        elif self.state == "settle":
+            self.learn_prompt(output)
+            self.expect("terminal width 512\n", "width")
+        elif self.state == "width":
+            self.expect("terminal length 0\n", "length")
+        elif self.state == "length":
+            self.advance_to_privilege()
+        elif self.state == "privilege":
+            hostname = self.learn_prompt(output)
+            if hostname:
+                self.hostname = hostname
+            if self.privileged(output):
+                self.privilege = IOS.ENABLE
+                self.first_command()
+            else:
+                self.expect("enable\n", "enable")
+        elif self.state == "enable" and IOS.CONFIRM.search(output[-IOS.TAIL_LEN:]):
+            self.expect("%s\n" % self.params["enablepw"], "password")
+        elif self.state in ("enable", "password"):
+            if "Access denied" in output or not self.privileged(output):
+                self.finish(False, msg="Enable password specified and an error occured entering enable mode.")
+            else:
+                self.privilege = IOS.ENABLE
+                self.first_command()
+        elif self.state == "uptime":
+            self.cache.validate(output)
+            self.filter_pipes()
+        elif self.state == "pipes":
+            self.pipes = "Invalid input" not in output
+            self.filter_pipes()
+        elif self.state == "command":
+            self.writer.close(self.prompt_found(self.tail))
+            self.next_command()
+        return
+
+
+
+    def advance_to_privilege(self):
+        " Logged in, determine the privilege level if enable mode is requested."
+
+        if self.params.get("enablepw") is None:
+            self.first_command()
+        else:
+            self.expect("\n", "privilege")
+        return
+
+
+
+    def first_command(self):
+        " Logged in and in enable mode if requested, learn the uptime for the cache, issue the commands."
+
+        self.write_header()
+        if self.cache is not None:
+            self.expect("%s\n" % Cache.PROBE, "uptime")
+        else:
+            self.filter_pipes()
+        return
+
+
+
+    def filter_pipes(self):
+        " Test if the node supports output modifiers if a command has filters, add them, issue the commands."
+
+        if self.pipes is None and self.filtered(self.commands):
+            self.expect("%s\n" % IOS.PIPES, "pipes")
+        else:
+            self.commands = self.filter_commands(self.commands)
+            self.next_command()
+        return
+
+
+
+    def next_command(self):
+        " Issue the next command, the output of those which are cached is written from the cache."
+
+        while self.commands:
+            item = self.commands.pop(0)
+            if self.cache is None or not self.cache.replay(item, self.file_obj, self.metrics["commands"]):
+                self.expect_command(item)
+                return
+        self.finish(True, content="Success.")
+        return
+
+
+
+    def expect_command(self, item):
+        " Send a command, its output is written as it is received."
+
+        self.writer = CommandWriter(self.local_filter(item, self.file_obj), self.maxbytes, item,
+                                    metrics=self.metrics["commands"])
+        self.expect("%s\n" % item, "command")
+        return
+
+
+
+    def finish(self, success, **result):
+        " The session is complete, the event loop closes it."
+
+        self.end_phase()
+        self.state = "finished"
+        self.result = (success, result)
+        return
+
+
+
+    def close(self):
+        " Close the channel and the output file."
+
+        self.logoff()
+        return
+
+
+
+def event_loop(hosts, params, forks=FORKS, logins=LOGINS):
+    """ Capture each host from a single thread, the channel of each open session is registered
+        with a selector and a session is advanced only when its channel has data. At most forks
+        sessions are open at a time, the blocking SSH logins run in a pool of logins threads.
+        Returns the same summary as fleet.
+    """
+
+    started = time.time()
+    selector = selectors.DefaultSelector()
+    waiting, results = preflight(list(hosts), params)      # popped as the sessions start
+    pending = queue.Queue()                                # sessions to login
+    connected = queue.Queue()                              # sessions logged in, or which failed to
+    active = []
+    state = read_checkpoint(params.get("checkpoint")) if params.get("resume") else None
+
+    def login():
+        " login sessions until told to stop"
+        while True:
+            session = pending.get()
+            if session is None:
+                return
+            session.login_blocking()
+            connected.put(session)
+
+    def step(session, action, *args):
+        " advance the session, an error of its channel or output file fails the session alone"
+        try:
+            action(*args)
+        except (paramiko.ssh_exception.SSHException, socket.error, IOError, EOFError) as msg:
+            session.finish(False, msg="%s: %s" % (type(msg).__name__, msg))
+
+    threads = [threading.Thread(target=login) for count in range(max(1, logins))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    while waiting or active:
+        while waiting and len(active) < forks:             # start sessions up to the limit
+            host = waiting.pop(0)
+            commands = resume_commands(dict(params, host=host), state)
+            if not commands:
+                results[host] = dict(content="Complete in the checkpoint.", skipped=len(params["commands"]),
+                                     failed=False)
+                continue
+            session = Session(dict(params, host=host, commands=commands,
+                                   skipped=len(params["commands"]) - len(commands)))
+            active.append(session)
+            if session.open_output_file(session.params["dest"], session.params["host"]):
+                pending.put(session)
+            else:
+                session.finish(False, msg="Error opening output file.")
+
+        while True:                                        # register the sessions logged in
+            try:
+                session = connected.get_nowait()
+            except queue.Empty:
+                break
+            if session.result is None:
+                selector.register(session.ssh, selectors.EVENT_READ, session)
+                step(session, session.expect, "\n", "settle" if session.reused else "banner")
+
+        for key, events in selector.select(TICK):
+            if key.data.result is None:
+                step(key.data, key.data.receive)
+
+        now = time.time()
+        for session in active:
+            step(session, session.expired, now)
+
+        for session in [session for session in active if session.result is not None]:
+            if session.ssh is not None and session.ssh in selector.get_map():
+                selector.unregister(session.ssh)
+            session.close()
+            success, result = session.result
+            result.update(session.sink_result())
+            write_checkpoint(params.get("checkpoint"), session.params["host"], success, result,
+                             session.command_status())
+            record_circuit(params.get("circuit"), session.params["host"], session)
+            if params.get("resume"):
+                result["skipped"] = session.params["skipped"]
+            if session.tracer is not None:
+                session.tracer.close(session.params["host"])
+            session.metrics["elapsed"] = round(time.time() - session.started, 4)
+            result["metrics"] = session.metrics
+            write_metrics(params.get("metrics"), "cisco_ios_show", session.params["host"], success, session.metrics)
+            result["failed"] = not success
+            results[session.params["host"]] = result
+            active.remove(session)
+
+    for thread in threads:
+        pending.put(None)
+    selector.close()
+    return summarize(results, started)
+
+
+
+def fleet_main():
+    " fleet mode, invoked from the command line rather than by Ansible"
+
+    parser = argparse.ArgumentParser(description="Issue show commands to an inventory of IOS devices.")
+    parser.add_argument("--inventory", required=True, help="file of hosts, one per line")
+    parser.add_argument("--commands", required=True, help="file of commands, one per line")
+    parser.add_argument("--dest", required=True, help="destination directory of the output files")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--forks", type=int, default=FORKS, help="number of devices captured at a time")
+    parser.add_argument("--engine", choices=("threads", "select"), default="threads",
+                        help="a thread per device, or a single thread multiplexing the sessions")
+    parser.add_argument("--logins", type=int, default=LOGINS, help="number of logins at a time, select engine")
+    parser.add_argument("--timeout", default=None, help="seconds to wait for the prompt after each command")
+    parser.add_argument("--connect-timeout", default=None, help="seconds allowed for the connection and SSH login")
+    parser.add_argument("--preflight", action="store_true", help="probe the SSH banner of every host before login")
+    parser.add_argument("--probes", type=int, default=PROBES, help="number of pre-flight probes open at a time")
+    parser.add_argument("--circuit", default=None, help="directory of the circuit breaker of each host")
+    parser.add_argument("--broker", default=None, help="path of the Unix socket of cisco_ios_broker.py")
+    parser.add_argument("--transport", choices=("shell", "exec"), default="shell",
+                        help="type each command in a shell, or run each on its own exec channel, threads engine")
+    parser.add_argument("--channels", type=int, default=1,
+                        help="channels of each connection to spread the commands across, threads engine")
+    parser.add_argument("--window", type=int, default=1, help="commands sent to the shell at once, threads engine")
+    parser.add_argument("--maxbytes", type=int, default=0, help="limit of the output of each command, 0 is none")
+    parser.add_argument("--compress", action="store_true", help="gzip the output files")
+    parser.add_argument("--index", action="store_true", help="write a side index of the output of each command")
+    parser.add_argument("--store", action="store_true", help="write to a content-addressed store in --dest")
+    parser.add_argument("--metrics", default=None, help="file of JSON lines, or .prom textfile, of the metrics")
+    parser.add_argument("--profile", default=None, help="file of Chrome trace events of the sessions")
+    parser.add_argument("--pstats", default=None, help="file of cProfile statistics of the process")
+    parser.add_argument("--drift", action="store_true", help="write the running configuration as a diff to a baseline")
+    parser.add_argument("--cache", default=None, help="directory of the cache of command output")
+    parser.add_argument("--cache-ttl", action="append", default=None, metavar="COMMAND=SECONDS",
+                        help="cache the output of the command for the seconds, repeat for each command")
+    parser.add_argument("--cache-size", type=int, default=None, help="limit of the size of the cache in bytes")
+    parser.add_argument("--parse", choices=("json", "csv"), default=None,
+                        help="write the records of the commands parsed, as JSON or CSV")
+    parser.add_argument("--filter", action="append", default=None, metavar="COMMAND=MODIFIER REGEX",
+                        help="filter the output of the command, include, exclude, begin or section, repeat for each")
+    parser.add_argument("--checkpoint", default=None, help="file of the status of each host and command of the run")
+    parser.add_argument("--resume", action="store_true", help="issue only the commands not complete in --checkpoint")
+    parser.add_argument("--debug", default=None)
+    args = parser.parse_args()
+    if args.engine == "select" and selectors is None:
+        parser.error("the select engine requires Python 3.4 or later")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.preflight and asyncio is None:
+        parser.error("--preflight requires Python 3.5 or later")
+
+    params = dict(username=args.username,
+                  password=os.environ.get("IOS_PASSWORD") or getpass.getpass("Password: "),
+                  enablepw=os.environ.get("IOS_ENABLEPW") or getpass.getpass("Enable password: ") or None,
+                  commands=read_commands(args.commands),
+                  dest=args.dest,
+                  timeout=args.timeout,
+                  connect_timeout=args.connect_timeout,
+                  preflight=args.preflight,
+                  probes=args.probes,
+                  circuit=args.circuit,
+                  broker=args.broker,
+                  transport=args.transport,
+                  channels=args.channels,
+                  window=args.window,
+                  maxbytes=args.maxbytes,
+                  compress=args.compress,
+                  index=args.index,
+                  store=args.store,
+                  metrics=args.metrics,
+                  profile=args.profile,
+                  drift=args.drift,
+                  cache=args.cache,
+                  cache_ttl=args.cache_ttl,
+                  cache_size=args.cache_size,
+                  parse=args.parse,
+                  filters=args.filter,
+                  checkpoint=args.checkpoint,
+                  resume=args.resume,
+                  debug=args.debug)
+
+    profiler = start_pstats(args.pstats)
+    if args.engine == "select":
+        summary = event_loop(read_inventory(args.inventory), params, forks=args.forks, logins=args.logins)
+    else:
+        summary = fleet(read_inventory(args.inventory), params, forks=args.forks)
+    stop_pstats(profiler, args.pstats)
+    sys.stdout.write("%s\n" % json.dumps(summary, indent=4, sort_keys=True))
+    sys.exit(1 if summary["failed"] else 0)
+
 # ---------------------------------------------------------------------------
 # MAIN
 # ---------------------------------------------------------------------------
@@ -300,39 +3126,51 @@ def main():
             enablepw=dict(required=False),
             commands=dict(type='list', required=True),
             dest=dict(required=True),
-            debug=dict(required=False)
+            debug=dict(required=False),
+            timeout=dict(required=False),
+            connect_timeout=dict(required=False),
+            circuit=dict(required=False),
+            broker=dict(required=False),
+            transport=dict(required=False, default="shell", choices=["shell", "exec"]),
+            channels=dict(required=False, type='int', default=1),
+            window=dict(required=False, type='int', default=1),
+            maxbytes=dict(required=False, type='int', default=0),
+            compress=dict(required=False, type='bool', default=False),
+            index=dict(required=False, type='bool', default=False),
+            store=dict(required=False, type='bool', default=False),
+            metrics=dict(required=False),
+            profile=dict(required=False),
+            pstats=dict(required=False),
+            drift=dict(required=False, type='bool', default=False),
+            cache=dict(required=False),
+            cache_ttl=dict(required=False, type='dict'),
+            cache_size=dict(required=False, type='int'),
+            parse=dict(required=False, choices=["json", "csv"]),
+            filters=dict(required=False, type='dict'),
+            checkpoint=dict(required=False),
+            resume=dict(required=False, type='bool', default=False)
         ),
         check_invalid_arguments=False,
         add_file_common_args=True
     )
 
-    node = IOS(paramiko.SSHClient())
-    node.set_debug(module.params["debug"])
-
-    if node.open_output_file(module.params["dest"], module.params["host"]):
-        pass
+    profiler = start_pstats(module.params["pstats"])
+    success, result = capture(module.params)
+    stop_pstats(profiler, module.params["pstats"])
+    if success:
+        result.setdefault("changed", False)                # changed if the configuration has drifted
+        module.exit_json(**result)
     else:
-        module.fail_json(msg="Error opening output file.")
+        module.fail_json(**result)
 
-                                                           # LOGIN
-    if node.login(module.params["host"], module.params["username"], module.params["password"]):
-        if node.enable_mode((module.params["enablepw"])):  # ENABLE MODE
-            pass
-        else:
-            node.logoff()
-            module.fail_json(msg="Enable password specified and an error occured entering enable mode.")
-
-        if node.issue_commands(module.params["commands"]): # ISSUE COMMANDS
-            node.logoff()
-            module.exit_json(changed=False, content="Success.")
-        else:
-            node.logoff()
-            module.fail_json(msg="Error issuing commands.")
-    else:
-        module.fail_json(msg=node.get_error_msg())
 
 
-
-from ansible.module_utils.basic import *
+try:
+    from ansible.module_utils.basic import *
+except ImportError:                                        # fleet mode and the functions run without Ansible
+    pass
 if __name__ == '__main__':
-    main()
+    if sys.argv[1:2] and sys.argv[1].startswith("--"):    # fleet mode, Ansible passes a file of arguments or none
+        fleet_main()
+    else:
+        main()
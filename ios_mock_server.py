@@ -0,0 +1,657 @@
+#!/usr/bin/env python
+#
+#
+"""
+     Copyright (c) 2015 World Wide Technology, Inc.
+     All rights reserved.
+
+     Revision history:
+     16 October  2026  |  1.0 - initial release
+                         1.1 - Output modifiers, '| include' and the like, rejected with --no-pipe.
+                         1.2 - 'dir' and 'delete /force' of the files saved from the running configuration.
+                         1.3 - Configuration mode, lines are added to the running configuration, 'bogus' rejected.
+                         1.4 - The exec command is run once its channel request has been answered.
+
+"""
+
+DOCUMENTATION = """
+
+  A local SSH server emulating the Cisco IOS CLI, so the modules can be exercised and timed without hardware.
+
+  Every address in 127.0.0.0/8 reaches the loopback interface on Linux, so one listener on 0.0.0.0 serves
+  a fleet of simulated devices, 127.0.0.1, 127.0.0.2, ... each with its own hostname and configuration.
+
+  The emulation covers:
+      MOTD and exec banners
+      '>' and '#' prompts, 'enable' with a password
+      'terminal width' and 'terminal length'
+      canned show command output of a configurable size
+      output modifiers '| include', '| exclude', '| begin', '| section'
+      'copy running-config <file>', 'copy <URL> running-config', '[OK]' and 'bytes copied' responses
+      'configure terminal', 'dir', 'delete /force'
+      exec channels, 'ssh admin@host show version', which can be refused with --no-exec
+      latency and jitter added to every response
+
+"""
+EXAMPLES = """
+
+    ./ios_mock_server.py --port 2222 --username admin --password redacted --enablepw redacted --latency 0.05 --jitter 0.02
+
+    ssh -p 2222 admin@127.0.0.7
+
+"""
+
+import paramiko
+import argparse
+import logging
+import random
+import re
+import socket
+import sys
+import threading
+import time
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+logging.getLogger("paramiko").addHandler(logging.NullHandler())  # clients which drop the connection are not errors
+
+# ---------------------------------------------------------------------------
+# CANNED OUTPUT
+# ---------------------------------------------------------------------------
+
+BANNER = """
+ UNAUTHORIZED ACCESS TO THIS NETWORK DEVICE IS PROHIBITED.
+ You must have explicit permission to access or configure this
+ device. All activities performed on this device are logged and
+ violations of this policy may result in disciplinary action.
+"""
+
+CONFIG = """version 15.2
+service timestamps debug datetime msec
+service timestamps log datetime msec
+!
+hostname %(hostname)s
+!
+boot-start-marker
+boot-end-marker
+!
+aaa new-model
+aaa authentication login default local
+aaa authorization exec default local
+!
+ip domain-name example.net
+!
+interface GigabitEthernet0/0
+ description uplink
+ ip address %(address)s 255.255.255.0
+!
+interface GigabitEthernet0/1
+ switchport mode access
+ switchport access vlan 10
+!
+ip route 0.0.0.0 0.0.0.0 10.255.40.1
+!
+line vty 0 15
+ transport input ssh
+!"""
+
+SHOW = {
+    "show version": """Cisco IOS Software, C2900 Software (C2900-UNIVERSALK9-M), Version 15.2(4)M6, RELEASE SOFTWARE (fc2)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2014 by Cisco Systems, Inc.
+
+ROM: System Bootstrap, Version 15.0(1r)M15, RELEASE SOFTWARE (fc1)
+
+%(hostname)s uptime is %(uptime)s
+System returned to ROM by power-on
+System image file is "flash0:c2900-universalk9-mz.SPA.152-4.M6.bin"
+
+Cisco CISCO2911/K9 (revision 1.0) with 483328K/40960K bytes of memory.
+Processor board ID FTX1234A5BC
+3 Gigabit Ethernet interfaces
+255K bytes of non-volatile configuration memory.
+
+Configuration register is 0x2102""",
+    "show inventory": """NAME: "CISCO2911/K9 chassis", DESCR: "CISCO2911/K9 chassis"
+PID: CISCO2911/K9      , VID: V06  , SN: FTX1234A5BC""",
+    "show license": """Index 1 Feature: ipbasek9
+        Period left: Life time
+        License Type: Permanent
+        License State: Active, In Use""",
+    "show ip interface brief": """Interface                  IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0         %(address)s    YES NVRAM  up                    up
+GigabitEthernet0/1         unassigned      YES NVRAM  administratively down down
+Vlan10                     10.10.10.1      YES NVRAM  up                    up""",
+    "show ip route": """Codes: L - local, C - connected, S - static, R - RIP, M - mobile, B - BGP
+       D - EIGRP, EX - EIGRP external, O - OSPF, IA - OSPF inter area
+
+Gateway of last resort is 10.255.40.1 to network 0.0.0.0
+
+S*    0.0.0.0/0 [1/0] via 10.255.40.1
+      10.0.0.0/8 is variably subnetted, 4 subnets, 3 masks
+C        10.10.10.0/24 is directly connected, Vlan10
+L        10.10.10.1/32 is directly connected, Vlan10
+O        10.20.0.0/16 [110/2] via 10.255.40.2, 00:12:01, GigabitEthernet0/0
+                      [110/2] via 10.255.40.3, 00:12:01, GigabitEthernet0/0
+B        10.30.0.0/16 [20/0] via 10.255.40.4, 1w2d""",
+    "show vlan": """
+VLAN Name                             Status    Ports
+---- -------------------------------- --------- -------------------------------
+1    default                          active    Gi0/2, Gi0/3, Gi0/4, Gi0/5
+                                                Gi0/6, Gi0/7
+10   USERS                            active    Gi0/1
+1002 fddi-default                     act/unsup""",
+    "show interface trunk": """
+Port        Mode             Encapsulation  Status        Native vlan
+Gi0/24      on               802.1q         trunking      1
+
+Port        Vlans allowed on trunk
+Gi0/24      1-4094
+
+Port        Vlans allowed and active in management domain
+Gi0/24      1,10
+
+Port        Vlans in spanning tree forwarding state and not pruned
+Gi0/24      1,10""",
+    "show cdp neighbor detail": """-------------------------
+Device ID: core-1.example.net
+Entry address(es):
+  IP address: 10.255.40.2
+Platform: cisco WS-C3850-24T,  Capabilities: Router Switch IGMP
+Interface: GigabitEthernet0/0,  Port ID (outgoing port): GigabitEthernet1/0/1
+Holdtime : 150 sec
+
+Version :
+Cisco IOS Software, IOS-XE Software, Catalyst L3 Switch Software, Version 03.06.06E RELEASE SOFTWARE (fc1)
+
+-------------------------
+Device ID: core-2.example.net
+Entry address(es):
+  IP address: 10.255.40.3
+Platform: cisco WS-C3850-24T,  Capabilities: Router Switch IGMP
+Interface: GigabitEthernet0/1,  Port ID (outgoing port): GigabitEthernet1/0/1
+Holdtime : 162 sec
+""",
+    "show privilege": "Current privilege level is %(privilege)s",
+}
+
+INVALID = "% Invalid input detected at '^' marker."
+
+# ---------------------------------------------------------------------------
+# DEVICE
+# ---------------------------------------------------------------------------
+
+class Device(object):
+    """ The state of one simulated router or switch, shared by every session to its address.
+    """
+
+    def __init__(self, address):
+
+        self.address = address
+        self.hostname = "mock-%s" % address.replace(".", "-")
+        self.booted = time.time()
+        self.config = (CONFIG % dict(hostname=self.hostname, address=address)).split("\n")
+        self.files = {}                                    # filename: contents, the default file system
+        self.lock = threading.Lock()
+
+    def running_config(self):
+        " the text of 'show running-config'"
+        body = "\n".join(self.config)
+        return "Building configuration...\n\nCurrent configuration : %s bytes\n!\n%s\nend" % (len(body), body)
+
+    def uptime(self):
+        " the uptime of 'show version', '1 week, 2 days, 3 hours, 4 minutes'"
+        minutes = int(time.time() - self.booted) // 60 + 12345
+        return "%s weeks, %s days, %s hours, %s minutes" % (minutes // 10080, minutes // 1440 % 7,
+                                                           minutes // 60 % 24, minutes % 60)
+
+# ---------------------------------------------------------------------------
+# SERVER
+# ---------------------------------------------------------------------------
+
+class Server(paramiko.ServerInterface):
+    """ Authenticate the login and accept the session, pty, shell and exec requests of one connection.
+    """
+
+    def __init__(self, options, device):
+
+        self.options = options
+        self.device = device
+        self.exec_command = None                           # (channel, command) accepted, until answered
+
+    def check_auth_password(self, username, password):
+        if username == self.options.username and password == self.options.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        thread = threading.Thread(target=Shell(self.options, self.device, channel).run)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        if self.options.no_exec:
+            return False
+        if not isinstance(command, str):
+            command = command.decode("utf-8")
+        self.exec_command = (channel, command)             # started by the transport once it has answered
+        return True
+
+    def start_exec(self):
+        " run the command accepted on its exec channel, the request has been answered"
+        if self.exec_command is None:
+            return
+        channel, command = self.exec_command
+        self.exec_command = None
+        thread = threading.Thread(target=Shell(self.options, self.device, channel).execute, args=(command,))
+        thread.daemon = True
+        thread.start()
+
+
+class Transport(paramiko.Transport):
+    """ The server side of one connection. A channel request is answered after the server accepts it,
+        so the output of an exec channel, and its close, wait for the answer. Closed before it, the
+        client's exec_command fails with 'Channel closed.'
+    """
+
+    def __init__(self, sock):
+
+        paramiko.Transport.__init__(self, sock)
+        self._channel_handler_table = dict(paramiko.Transport._channel_handler_table)
+        self._channel_handler_table[paramiko.common.MSG_CHANNEL_REQUEST] = self.channel_request
+
+    def channel_request(self, channel, message):
+        " accept and answer the request of the channel, then start the exec it asked for"
+        paramiko.Channel._handle_request(channel, message)
+        self.server_object.start_exec()
+
+# ---------------------------------------------------------------------------
+# LINK
+# ---------------------------------------------------------------------------
+
+class Link(object):
+    """ Delay the output of a channel by the latency, and jitter, of the simulated network. The
+        delay is a pipeline, output sent together arrives together, as it would over a WAN.
+    """
+
+    def __init__(self, options, channel):
+
+        self.options = options
+        self.channel = channel
+        self.queue = []                                    # (time to deliver, data), in order
+        self.last = 0.0
+        self.closing = None
+        self.condition = threading.Condition()
+        thread = threading.Thread(target=self.deliver)
+        thread.daemon = True
+        thread.start()
+
+    def send(self, data):
+        " queue the data for delivery after the latency, never before data already queued"
+        delay = self.options.latency + random.uniform(0, self.options.jitter)
+        with self.condition:
+            self.last = max(self.last, time.time() + delay)
+            self.queue.append((self.last, data))
+            self.condition.notify()
+
+    def close(self, exit_status=None):
+        " close the channel once the queued data is delivered"
+        with self.condition:
+            self.closing = (exit_status,)
+            self.condition.notify()
+
+    def deliver(self):
+        " send the queued data as it becomes due"
+        while True:
+            with self.condition:
+                while not self.queue and self.closing is None:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                due, data = self.queue[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self.queue.pop(0)
+            try:
+                self.channel.sendall(data)
+            except (socket.error, EOFError):
+                return
+        try:
+            if self.closing[0] is not None:
+                self.channel.send_exit_status(self.closing[0])
+            self.channel.close()
+        except (socket.error, EOFError):                   # the client closed the connection first
+            pass
+
+# ---------------------------------------------------------------------------
+# SHELL
+# ---------------------------------------------------------------------------
+
+class Shell(object):
+    """ The command line interpreter of one channel, echoes input and answers with output and a prompt.
+    """
+
+    def __init__(self, options, device, channel):
+
+        self.options = options
+        self.device = device
+        self.channel = channel
+        self.privilege = options.privilege
+        self.mode = "exec"                                 # exec or config
+        self.pending = None                                # a question waiting for a line, (callable, echo)
+        self.link = Link(options, channel)
+
+    def prompt(self):
+        " 'isr-2911-a>', 'isr-2911-a#' or 'isr-2911-a(config)#'"
+        if self.mode == "config":
+            return "%s(config)#" % self.device.hostname
+        return "%s%s" % (self.device.hostname, "#" if self.privilege == 15 else ">")
+
+    def send(self, text):
+        " convert the line endings and send the response over the link"
+        self.link.send(text.replace("\r\n", "\n").replace("\n", "\r\n"))
+
+    def run(self):
+        " interactive shell, the banners, then a prompt for each line received"
+        self.send("%s\n%s" % (self.options.banner, self.prompt()))
+        line = ""
+        carriage_return = False
+        while True:
+            data = self.channel.recv(4096)
+            if not data:
+                break
+            if not isinstance(data, str):
+                data = data.decode("utf-8", "replace")
+            for char in data:
+                if char == "\n" and carriage_return:      # '\r\n' ends one line, not two
+                    carriage_return = False
+                    continue
+                carriage_return = char == "\r"
+                if char in "\r\n":
+                    self.line(line)
+                    line = ""
+                else:
+                    line = line + char
+        self.link.close()
+
+    def execute(self, command):
+        " exec channel, the output of a single command then EOF"
+        self.privilege = self.options.privilege
+        self.send("%s\n" % self.command(command.strip()))
+        self.link.close(exit_status=0)
+
+    def line(self, line):
+        " answer one line of input, the echo, the output, and the prompt or question which follows"
+        if self.pending:
+            answer, echo = self.pending
+            self.pending = None
+            if echo:
+                self.send(line + "\n")
+            else:
+                self.send("\n")
+            output = answer(line.strip())
+        else:
+            self.send(line + "\n")
+            output = self.command(line.strip())
+        if self.pending:
+            return self.send(output)
+        if output:
+            output = output + "\n"
+        self.send(output + self.prompt())
+
+    def question(self, text, answer, echo=True):
+        " ask for a line of input, 'Destination filename [startup-config]? '"
+        self.pending = (answer, echo)
+        return text
+
+    def command(self, line):
+        " the output of a command, less the prompt"
+        if not line:
+            return ""
+        if self.mode == "config":
+            return self.configure(line)
+
+        pipe = None
+        if "|" in line:
+            line, pipe = [part.strip() for part in line.split("|", 1)]
+        words = line.split()
+        verb = words[0]
+        if "terminal".startswith(verb) and len(words) == 3:
+            return ""
+        if verb == "enable":
+            return self.question("Password: ", self.enable, echo=False)
+        if verb in ("disable", "exit"):
+            self.privilege = 1
+            return ""
+        if "show".startswith(verb) and len(words) > 1:
+            return self.modifier(self.show(" ".join(words[1:])), pipe)
+        if self.privilege < 15:
+            return INVALID
+        if "configure".startswith(verb) and len(words) == 2 and "terminal".startswith(words[1]):
+            self.mode = "config"
+            return "Enter configuration commands, one per line.  End with CNTL/Z."
+        if verb == "copy" and len(words) >= 3:
+            return self.copy(words[1], words[2], words[3:])
+        if verb == "dir":
+            return self.dir()
+        if verb == "delete" and len(words) == 3 and words[1] == "/force":
+            self.device.files.pop(words[2].split(":")[-1], None)
+            return ""
+        return INVALID
+
+    def show(self, what):
+        " the canned output of a show command, or filler of the configured size"
+        substitute = dict(hostname=self.device.hostname, address=self.device.address.ljust(15)[:15].strip(),
+                          uptime=self.device.uptime(), privilege=self.privilege)
+        if re.match(r"^run(n(i(n(g(-(c(o(n(f(i(g)?)?)?)?)?)?)?)?)?)?)?$", what):
+            if self.privilege < 15:
+                return INVALID
+            return self.device.running_config()
+        for command, output in SHOW.items():
+            if " ".join(command.split()[1:]) == what:
+                return output % substitute
+        filler = []
+        size = 0
+        while size < self.options.show_bytes:
+            line = "%-10s %s line %s" % (self.device.hostname[:10], what, len(filler))
+            filler.append(line)
+            size = size + len(line) + 2
+        return "\n".join(filler)
+
+    def modifier(self, output, pipe):
+        " the output modifiers, '| include', '| exclude', '| begin' and '| section'"
+        if pipe is None:
+            return output
+        words = pipe.split(None, 1)
+        if len(words) != 2 or self.options.no_pipe:
+            return INVALID
+        verb, pattern = words
+        regex = re.compile(pattern)
+        lines = output.split("\n")
+        if "include".startswith(verb):
+            return "\n".join([line for line in lines if regex.search(line)])
+        if "exclude".startswith(verb):
+            return "\n".join([line for line in lines if not regex.search(line)])
+        if "begin".startswith(verb):
+            for index, line in enumerate(lines):
+                if regex.search(line):
+                    return "\n".join(lines[index:])
+            return ""
+        if "section".startswith(verb):
+            selected = []
+            keep = False
+            for line in lines:
+                if not line.startswith(" "):
+                    keep = bool(regex.search(line))
+                if keep:
+                    selected.append(line)
+            return "\n".join(selected)
+        return INVALID
+
+    def enable(self, password):
+        " the answer to 'Password: '"
+        if password == self.options.enablepw:
+            self.privilege = 15
+            return ""
+        return "% Access denied\n"
+
+    def configure(self, line):
+        " a line of configuration mode, 'end' returns to exec mode"
+        if line in ("end", "exit") or line == "\x1a":
+            self.mode = "exec"
+            return ""
+        if line.split()[0].startswith("bogus"):
+            return INVALID
+        self.device.config.append(line)
+        return ""
+
+    def copy(self, source, destination, options):
+        " 'copy running-config <file>' and 'copy <URL> running-config'"
+        if source == "running-config":
+            name = destination.split(":")[-1]
+            def save(answer):
+                " the answer to 'Destination filename'"
+                if name == "startup-config":
+                    return "Building configuration...\n[OK]"
+                self.device.files[name] = self.device.running_config()
+                return "\n%s bytes copied in 0.120 secs (%s bytes/sec)" % (len(self.device.files[name]),
+                                                                            len(self.device.files[name]) * 8)
+            return self.question("Destination filename [%s]? " % name, save)
+
+        if destination == "running-config":
+            def load(answer):
+                " the answer to 'Destination filename', transfer the file and merge it"
+                try:
+                    if source.startswith("ftp:") and self.options.ftp_stub:
+                        with open(self.options.ftp_stub) as stub:
+                            text = stub.read()
+                    else:
+                        text = urlopen(source, timeout=10).read()
+                        if not isinstance(text, str):
+                            text = text.decode("utf-8", "replace")
+                except Exception:
+                    return "Accessing %s...\n%%Error opening %s (Timed out)" % (source, source)
+                for line in text.splitlines():
+                    if line.strip() and not line.startswith(("!", "#")) and line.strip() != "end":
+                        self.device.config.append(line)
+                return "Accessing %s...\n[OK - %s bytes]\n\n%s bytes copied in 0.340 secs (%s bytes/sec)" % (
+                    source, len(text), len(text), len(text) * 3)
+            return self.question("Destination filename [running-config]? ", load)
+        return INVALID
+
+    def dir(self):
+        " 'dir', a listing of the default file system"
+        lines = ["Directory of flash:/", ""]
+        for index, name in enumerate(sorted(self.device.files)):
+            lines.append("%5s  -rw- %12s  Oct 16 2026 10:%02d:00 +00:00  %s" % (index + 1,
+                         len(self.device.files[name]), index % 60, name))
+        lines.append("")
+        lines.append("256487424 bytes total (201535488 bytes free)")
+        return "\n".join(lines)
+
+# ---------------------------------------------------------------------------
+# LISTENER
+# ---------------------------------------------------------------------------
+
+class Listener(object):
+    """ Accept connections and hand each to a paramiko Transport, the device is the address connected to.
+    """
+
+    def __init__(self, options):
+
+        self.options = options
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((options.address, options.port))
+        self.sock.listen(1024)
+        self.port = self.sock.getsockname()[1]
+
+    def device(self, address):
+        " the device simulated at an address, created on first use"
+        with self.lock:
+            if address not in self.devices:
+                self.devices[address] = Device(address)
+            return self.devices[address]
+
+    def serve_forever(self):
+        " accept connections until the process is interrupted"
+        while True:
+            conn, peer = self.sock.accept()
+            thread = threading.Thread(target=self.handle, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def start(self):
+        " accept connections in a background thread, for use by a benchmark in the same process"
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def handle(self, conn):
+        " run the SSH server side of one connection"
+        transport = Transport(conn)
+        transport.add_server_key(self.host_key)
+        server = Server(self.options, self.device(conn.getsockname()[0]))
+        try:
+            transport.start_server(server=server)
+        except (paramiko.SSHException, EOFError, socket.error):
+            transport.close()
+
+# ---------------------------------------------------------------------------
+# MAIN
+# ---------------------------------------------------------------------------
+
+def get_parser():
+    " the command line options, also used by the benchmark to configure an in-process server"
+    parser = argparse.ArgumentParser(description="Local SSH server emulating the Cisco IOS CLI.")
+    parser.add_argument("--address", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=2222, help="port to listen on, 0 picks a free port")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="redacted")
+    parser.add_argument("--enablepw", default="redacted", help="the enable password")
+    parser.add_argument("--privilege", type=int, default=1, choices=(1, 15), help="privilege level at login")
+    parser.add_argument("--banner", default=BANNER, help="MOTD and exec banner text")
+    parser.add_argument("--show-bytes", type=int, default=4096, help="size of the output of other show commands")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random seconds, up to, added to the latency")
+    parser.add_argument("--no-exec", action="store_true", help="refuse exec channels")
+    parser.add_argument("--no-pipe", action="store_true", help="reject output modifiers")
+    parser.add_argument("--ftp-stub", default=None, help="file of configuration returned for any ftp: URL")
+    return parser
+
+
+def main():
+    "main"
+    options = get_parser().parse_args()
+    listener = Listener(options)
+    sys.stdout.write("Listening on %s port %s\n" % (options.address, listener.port))
+    sys.stdout.flush()
+    try:
+        listener.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
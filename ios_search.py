@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+#
+#
+"""
+     Copyright (c) 2015 World Wide Technology, Inc.
+     All rights reserved.
+
+     Revision history:
+     16 October  2026  |  1.0 - initial release
+
+"""
+
+DOCUMENTATION = """
+
+  An inverted index of the output captured by cisco_ios_show, to find which hosts' output holds a token,
+  a version, an address or a MAC address, without reading the captures.
+
+  'index' reads the captures in the destination directory of cisco_ios_show which have not been indexed:
+      output files written with the 'index' option, cis_<host>_<julian-day>.log[.gz] and their .idx
+      runs written to the content-addressed store with the 'store' option, manifests/<host>/<time>.json
+  Each command of a capture is a row giving the host, command, time and where its output is: the offset
+  and length in the output file, or the sha256 of the blob. Each token of the output, lower case, is a
+  posting of the command. The index is a SQLite database, by default <dest>/search.db. Run it after each
+  capture, only the entries appended to an .idx file, or the manifests written, since the last run are read.
+
+  'query' returns the commands whose output holds every term, the latest output of each host and command
+  unless --all is given. A term ending '*' matches any token it begins. With --lines, the lines holding a
+  term are read from the captures, only the output of the commands found is read.
+
+  A token is a run of letters, digits and . : / ( ) -, 'GigabitEthernet0/1', '10.1.1.0/24', '0011.2233.4455',
+  '15.2(4)M6'; a token holding '/' is also indexed as its parts, '10.1.1.0' and '24'.
+
+"""
+EXAMPLES = """
+
+    ./cisco_ios_show.py --inventory /etc/ansible/hosts --commands runcmd.txt --dest /var/audit --username admin --index
+    ./ios_search.py index --dest /var/audit
+
+    ./ios_search.py query --dest /var/audit --command "show version" "15.2(4)M6"
+    ./ios_search.py query --dest /var/audit --lines 0011.2233.4455
+    ./ios_search.py query --dest /var/audit --all --host isr-2911-a "10.255.*"
+
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+TOKEN = re.compile(r"[\w.:/()\-]+")
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, position INTEGER);
+    CREATE TABLE IF NOT EXISTS captures (id INTEGER PRIMARY KEY, host TEXT, command TEXT, time REAL, status TEXT,
+                                         path TEXT, offset INTEGER, length INTEGER, sha256 TEXT, latest INTEGER);
+    CREATE INDEX IF NOT EXISTS captures_latest ON captures (host, command, latest);
+    CREATE TABLE IF NOT EXISTS postings (token TEXT, capture INTEGER, PRIMARY KEY (token, capture));
+"""
+OUTPUT_FILE = re.compile(r"^cis_(?P<host>.+)_\d{3}\.log(\.gz)?\.idx$")   # the side index of an output file
+
+# ---------------------------------------------------------------------------
+# CAPTURES
+# ---------------------------------------------------------------------------
+
+def tokens(text):
+    " Return the set of tokens of the text, lower case."
+
+    found = set()
+    for match in TOKEN.finditer(text.lower()):
+        token = match.group().strip(".:-/")
+        if token.count("(") != token.count(")"):           # '(fc2),' or 'Version(' is not balanced
+            token = token.strip("()")
+        if len(token) < 2:
+            continue
+        found.add(token)
+        if "/" in token:
+            found.update([part for part in token.split("/") if len(part) > 1])
+    return found
+
+
+
+def read_output(dest, capture):
+    " Return the output of a capture, from its output file or from the store."
+
+    if capture["sha256"]:
+        with gzip.open("%s/blobs/%s/%s.gz" % (dest, capture["sha256"][:2], capture["sha256"]), "rb") as file_obj:
+            return file_obj.read().decode("utf-8", "replace")
+    with open(capture["path"], "rb") as file_obj:
+        file_obj.seek(capture["offset"])
+        data = file_obj.read(capture["length"])
+    if capture["path"].endswith(".gz"):
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)  # a gzip member
+    return data.decode("utf-8", "replace")
+
+# ---------------------------------------------------------------------------
+# INDEX
+# ---------------------------------------------------------------------------
+
+def connect(database):
+    " Open the index, created if it does not exist."
+
+    connection = sqlite3.connect(database)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+
+def add(connection, dest, capture):
+    " Add a capture and the postings of the tokens of its output, it becomes the latest of its host and command."
+
+    cursor = connection.cursor()
+    newer = cursor.execute("SELECT 1 FROM captures WHERE host = ? AND command = ? AND latest = 1 AND time > ?",
+                           (capture["host"], capture["command"], capture["time"])).fetchone()
+    latest = newer is None                                 # the captures of another day may be indexed later
+    if latest:
+        cursor.execute("UPDATE captures SET latest = 0 WHERE host = ? AND command = ? AND latest = 1",
+                       (capture["host"], capture["command"]))
+    cursor.execute("INSERT INTO captures (host, command, time, status, path, offset, length, sha256, latest) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                   (capture["host"], capture["command"], capture["time"], capture["status"], capture["path"],
+                    capture["offset"], capture["length"], capture["sha256"], int(latest)))
+    cursor.executemany("INSERT OR IGNORE INTO postings (token, capture) VALUES (?, ?)",
+                       [(token, cursor.lastrowid) for token in tokens(read_output(dest, capture))])
+    return
+
+
+
+def index_output_file(connection, dest, path, host):
+    " Index the entries appended to the side index of an output file since the last run, returns their number."
+
+    row = connection.execute("SELECT position FROM sources WHERE path = ?", (path,)).fetchone()
+    position = row[0] if row else 0
+    count = 0
+    with open(path, "rb") as index:
+        index.seek(position)
+        for line in index:
+            if not line.endswith(b"\n"):                   # being written, read on the next run
+                break
+            position = position + len(line)
+            if not line.strip():
+                continue
+            entry = json.loads(line.decode("utf-8"))
+            add(connection, dest, dict(host=host, command=entry["command"], time=entry["start"],
+                                       status=entry["status"], path=path[:-len(".idx")], offset=entry["offset"],
+                                       length=entry["length"], sha256=None))
+            count = count + 1
+    connection.execute("INSERT OR REPLACE INTO sources (path, position) VALUES (?, ?)", (path, position))
+    connection.commit()
+    return count
+
+
+
+def index_manifest(connection, dest, path):
+    " Index the commands of a manifest of the store, if it has not been indexed, returns their number."
+
+    if connection.execute("SELECT 1 FROM sources WHERE path = ?", (path,)).fetchone():
+        return 0
+    with open(path) as file_obj:
+        manifest = json.load(file_obj)
+    for item in manifest["commands"]:
+        add(connection, dest, dict(host=manifest["host"], command=item["command"], time=item["start"],
+                                   status=item["status"], path=path, offset=None, length=item["length"],
+                                   sha256=item["sha256"]))
+    connection.execute("INSERT OR REPLACE INTO sources (path, position) VALUES (?, ?)", (path, 0))
+    connection.commit()
+    return len(manifest["commands"])
+
+
+
+def index(dest, database):
+    " Index the captures in the destination directory not already indexed. Returns a summary."
+
+    started = time.time()
+    connection = connect(database)
+    summary = dict(output_files=0, manifests=0, commands=0)
+    for name in sorted(os.listdir(dest)):
+        match = OUTPUT_FILE.match(name)
+        if match:
+            count = index_output_file(connection, dest, os.path.join(dest, name), match.group("host"))
+            summary["output_files"] = summary["output_files"] + int(count > 0)
+            summary["commands"] = summary["commands"] + count
+    for path, directories, files in os.walk(os.path.join(dest, "manifests")):
+        for name in sorted(files):
+            if name.endswith(".json"):
+                count = index_manifest(connection, dest, os.path.join(path, name))
+                summary["manifests"] = summary["manifests"] + int(count > 0)
+                summary["commands"] = summary["commands"] + count
+    connection.close()
+    summary["elapsed"] = round(time.time() - started, 3)
+    return summary
+
+# ---------------------------------------------------------------------------
+# QUERY
+# ---------------------------------------------------------------------------
+
+def query(database, terms, command=None, host=None, latest=True):
+    " Return the captures whose output holds every term, most recent first."
+
+    connection = connect(database)
+    clauses = []
+    arguments = []
+    for term in terms:
+        term = term.lower()
+        if term.endswith("*"):                             # a range of the primary key, not a scan
+            clauses.append("SELECT capture FROM postings WHERE token >= ? AND token < ?")
+            arguments.extend([term[:-1], term[:-1] + u"\uffff"])
+        else:
+            clauses.append("SELECT capture FROM postings WHERE token = ?")
+            arguments.append(term)
+    sql = "SELECT * FROM captures WHERE id IN (%s)" % " INTERSECT ".join(clauses)
+    if command:
+        sql = sql + " AND command = ?"
+        arguments.append(" ".join(command.split()))
+    if host:
+        sql = sql + " AND host = ?"
+        arguments.append(host)
+    if latest:
+        sql = sql + " AND latest = 1"
+    connection.row_factory = sqlite3.Row
+    captures = [dict(row) for row in connection.execute(sql + " ORDER BY time DESC, host", arguments)]
+    connection.close()
+    return captures
+
+
+
+def matching_lines(dest, capture, terms):
+    " Return the lines of the output of a capture holding any of the terms."
+
+    terms = [term.lower().rstrip("*") for term in terms]
+    return [line.strip() for line in read_output(dest, capture).splitlines()
+            if [term for term in terms if term in line.lower()]]
+
+# ---------------------------------------------------------------------------
+# MAIN
+# ---------------------------------------------------------------------------
+
+def main():
+    "main"
+
+    parser = argparse.ArgumentParser(description="Inverted index of the output captured by cisco_ios_show.")
+    actions = parser.add_subparsers(dest="action")
+    actions.required = True                                # optional by default in Python 3
+    for action, text in (("index", "index the captures not already indexed"), ("query", "find the captures")):
+        subparser = actions.add_parser(action, help=text)
+        subparser.add_argument("--dest", required=True, help="destination directory of cisco_ios_show")
+        subparser.add_argument("--database", default=None, help="the index, default <dest>/search.db")
+    subparser.add_argument("terms", nargs="+", help="tokens the output holds, a term ending * matches any it begins")
+    subparser.add_argument("--command", default=None, help="only the output of the command")
+    subparser.add_argument("--host", default=None, help="only the output of the host")
+    subparser.add_argument("--all", action="store_true", help="every capture, not only the latest of each host")
+    subparser.add_argument("--lines", action="store_true", help="read the lines holding a term from the captures")
+    args = parser.parse_args()
+    database = args.database or os.path.join(args.dest, "search.db")
+
+    if args.action == "index":
+        sys.stdout.write("%s\n" % json.dumps(index(args.dest, database), sort_keys=True))
+        return
+
+    started = time.time()
+    captures = query(database, args.terms, args.command, args.host, not args.all)
+    for capture in captures:
+        result = dict(host=capture["host"], command=capture["command"], status=capture["status"],
+                      time=time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(capture["time"])))
+        if args.lines:
+            result["lines"] = matching_lines(args.dest, capture, args.terms)
+        sys.stdout.write("%s\n" % json.dumps(result, sort_keys=True))
+    sys.stderr.write("%s captures, %.3f seconds\n" % (len(captures), time.time() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+     Copyright (c) 2015 World Wide Technology, Inc.
+     All rights reserved.
+
+     Revision history:
+     16 October  2026  |  1.0 - initial release
+
+"""
+
+DOCUMENTATION = """
+
+  Support code shared by cisco_ios_show and cisco_ios_install_config: the shell of a session held by
+  cisco_ios_broker.py, the metrics file of a run, the trace events and cProfile statistics of a run and
+  the hosts of an inventory.
+
+  Ansible imports it as ansible.module_utils.ios_common and ships it with the modules when this directory
+  is on the module_utils path, 'module_utils = ./module_utils' in ansible.cfg. Run from the command line,
+  the modules import it from the directory beside them.
+
+"""
+
+import cProfile
+import json
+import os
+import threading
+import time
+import zlib
+
+# ---------------------------------------------------------------------------
+# BROKER
+# ---------------------------------------------------------------------------
+
+class BrokerChannel(object):
+    """ The shell of a session held by cisco_ios_broker.py, relayed over a Unix socket.
+        Provides the methods of the paramiko channel which IOS uses.
+    """
+
+    def __init__(self, sock):
+
+        self.sock = sock
+        self.closed = False
+
+    def send(self, data):
+        " send to the shell"
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        self.sock.sendall(data)
+        return len(data)
+
+    def recv(self, nbytes):
+        " receive from the shell"
+        return self.sock.recv(nbytes)
+
+    def settimeout(self, timeout):
+        " timeout of recv"
+        self.sock.settimeout(timeout)
+
+    def fileno(self):
+        " for select"
+        return self.sock.fileno()
+
+    def close(self):
+        " detach, the broker keeps the session"
+        self.sock.close()
+        self.closed = True
+
+# ---------------------------------------------------------------------------
+# METRICS
+# ---------------------------------------------------------------------------
+
+def write_metrics(path, module, host, success, metrics):
+    """ Append the metrics of a run to a file of JSON lines, or if the path ends .prom, write them to the
+        Prometheus textfile of the host, <path less .prom>_<host>.prom, replaced for each run.
+    """
+
+    if not path:
+        return
+    if not path.endswith(".prom"):
+        line = json.dumps(dict(metrics, module=module, host=host, success=success, time=round(time.time(), 3)),
+                          sort_keys=True)
+        with open(path, "a") as file_obj:
+            file_obj.write("%s\n" % line)                  # a single write, lines of concurrent runs do not mix
+        return
+
+    def label(value):
+        " a label value, with backslash, quote and newline escaped"
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    labels = 'module="%s",host="%s"' % (module, label(host))
+    commands = {}                                          # a command issued twice is one series
+    for item in metrics["commands"]:
+        seconds, size = commands.get(item["command"], (0.0, 0))
+        commands[item["command"]] = (seconds + item["seconds"], size + item["bytes"])
+    lines = ["# HELP ios_phase_seconds Seconds of each phase of the session.", "# TYPE ios_phase_seconds gauge"]
+    for phase in sorted(metrics["phases"]):
+        lines.append('ios_phase_seconds{%s,phase="%s"} %s' % (labels, phase, metrics["phases"][phase]))
+    lines.extend(["# HELP ios_command_seconds Seconds of each command.", "# TYPE ios_command_seconds gauge"])
+    for command in sorted(commands):
+        lines.append('ios_command_seconds{%s,command="%s"} %s' % (labels, label(command), commands[command][0]))
+    lines.extend(["# HELP ios_command_bytes Bytes of output of each command.", "# TYPE ios_command_bytes gauge"])
+    for command in sorted(commands):
+        lines.append('ios_command_bytes{%s,command="%s"} %s' % (labels, label(command), commands[command][1]))
+    for name, value, text in (("ios_bytes_sent", metrics["bytes_sent"], "Bytes sent to the device."),
+                              ("ios_bytes_received", metrics["bytes_received"], "Bytes received from the device."),
+                              ("ios_elapsed_seconds", metrics.get("elapsed", 0), "Seconds of the run."),
+                              ("ios_success", int(bool(success)), "1 if the run succeeded."),
+                              ("ios_last_run_timestamp_seconds", round(time.time(), 3), "Time of the run.")):
+        lines.extend(["# HELP %s %s" % (name, text), "# TYPE %s gauge" % name, "%s{%s} %s" % (name, labels, value)])
+
+    textfile = "%s_%s.prom" % (path[:-len(".prom")], host)
+    temporary = "%s.%s" % (textfile, os.getpid())          # renamed, the collector never reads a partial file
+    with open(temporary, "w") as file_obj:
+        file_obj.write("%s\n" % "\n".join(lines))
+    os.rename(temporary, textfile)
+    return
+
+# ---------------------------------------------------------------------------
+# PROFILE
+# ---------------------------------------------------------------------------
+
+class Tracer(object):
+    """ The spans of a session, each command sent and each wait for output, written to a file of Chrome
+        trace events for chrome://tracing or Perfetto. Each host is a process of the trace, each thread
+        of the session a thread of the host. The events of every host and run are appended to the one
+        file, a JSON array which the trace format allows to be left without its closing bracket.
+    """
+
+    LOCK = threading.Lock()                                # the hosts of fleet mode share the file
+
+    def __init__(self, path):
+
+        self.path = path
+        self.events = []
+        self.lanes = {}                                    # thread ident: thread of the trace
+
+    def span(self, name, category, started, **args):
+        " record a span from started until now"
+        lane = self.lanes.setdefault(threading.current_thread().ident, len(self.lanes) + 1)
+        self.events.append(dict(name=name, cat=category, ph="X", ts=int(started * 1000000),
+                                dur=int((time.time() - started) * 1000000), tid=lane, args=args))
+
+    def close(self, host):
+        " append the spans of the host to the trace file"
+        pid = zlib.crc32(host.encode("utf-8")) & 0x7fffffff
+        events = [dict(name="process_name", ph="M", pid=pid, tid=0, args=dict(name=host))]
+        for event in self.events:
+            event["pid"] = pid
+            events.append(event)
+        data = "".join(["%s,\n" % json.dumps(event, sort_keys=True) for event in events]).encode("utf-8")
+        self.events = []
+        with Tracer.LOCK:
+            try:                                           # the first run starts the array
+                handle = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+                os.write(handle, b"[\n")
+            except OSError:
+                handle = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                while data:                                # O_APPEND, runs in other processes do not interleave
+                    data = data[os.write(handle, data):]
+            finally:
+                os.close(handle)
+
+
+
+def start_pstats(path):
+    " Start cProfile for the process if a path for the statistics is given, returns the profiler or None."
+
+    if not path:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+
+def stop_pstats(profiler, path):
+    " Stop the profiler and write the statistics, for pstats or snakeviz."
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(path)
+    return
+
+# ---------------------------------------------------------------------------
+# INVENTORY
+# ---------------------------------------------------------------------------
+
+def read_inventory(filename):
+    """ Return the hosts of an inventory file, one per line. Comments, group headers and the
+        host variables of an Ansible INI inventory are ignored, as are the lines of its [group:vars]
+        and [group:children] sections, which are variables and groups. Duplicate hosts are dropped.
+    """
+
+    hosts = []
+    section = ""
+    with open(filename) as inventory:
+        for line in inventory:
+            line = line.strip()
+            if line.startswith("["):                       # [group], [group:vars] or [group:children]
+                section = line[1:].split("]")[0]
+                continue
+            if not line or line[0] in "#;":
+                continue
+            if section.endswith(":vars") or section.endswith(":children"):
+                continue
+            host = line.split()[0]
+            if host not in hosts:
+                hosts.append(host)
+    return hosts
@@ -0,0 +1,39 @@
+" The modules are single files at the top of the repository, import them from there. The fakes the tests share."
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Sink(object):
+    " the output file, records what is written"
+
+    def __init__(self):
+        self.data = []
+        self.status = []
+
+    def begin(self, command, start=None):
+        pass
+
+    def write(self, data):
+        self.data.append(data if isinstance(data, bytes) else data.encode("utf-8"))
+
+    def end(self, status, end=None):
+        self.status.append(status)
+
+    def close(self):
+        pass
+
+    def text(self):
+        return b"".join(self.data).decode("utf-8")
+
+
+def capture(sink, command, data, status="ok"):
+    " write the output of the command through the sink, return what reaches the output file beneath it"
+    output = sink.file_obj
+    output.data = []
+    sink.begin(command)
+    sink.write(data)
+    sink.end(status)
+    return output.text()
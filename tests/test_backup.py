@@ -0,0 +1,44 @@
+" backup_files and expired, the backups of a host and those pruned beyond the generations kept."
+
+import cisco_ios_install_config as install_config
+
+NAMES = ["isr-2911-a_20261016093000_00000000000000bb.cfg",
+         "isr-2911-a_20261014120000_00000000000000aa.cfg",
+         "isr-2911-a_9e107d9d372bb6826bd81d3542a419d6.cfg",  # md5 of the time, before 1.12
+         "isr-2911-a_20261015080000_00000000000000cc.cfg",
+         "isr-2911-ab_20261016100000_00000000000000dd.cfg",  # another host
+         "isr-2911-a_20261016100000_00000000000000ee.txt",
+         "startup-config",
+         "c2900-universalk9-mz.SPA.157-3.M4b.bin"]
+
+
+def test_backups_of_the_host_oldest_first():
+    assert install_config.backup_files(NAMES, "isr-2911-a") == [
+        ("", "", "isr-2911-a_9e107d9d372bb6826bd81d3542a419d6.cfg"),
+        ("20261014120000", "00000000000000aa", "isr-2911-a_20261014120000_00000000000000aa.cfg"),
+        ("20261015080000", "00000000000000cc", "isr-2911-a_20261015080000_00000000000000cc.cfg"),
+        ("20261016093000", "00000000000000bb", "isr-2911-a_20261016093000_00000000000000bb.cfg")]
+    assert install_config.backup_files(NAMES, "isr-2911") == []
+    assert install_config.backup_files(["a.b_20261014120000_00000000000000aa.cfg"], "a*b") == []
+
+
+def test_expired_beyond_the_generations():
+    found = install_config.backup_files(NAMES, "isr-2911-a")
+    assert install_config.expired(found, 2, "00000000000000bb") == [
+        "isr-2911-a_9e107d9d372bb6826bd81d3542a419d6.cfg",
+        "isr-2911-a_20261014120000_00000000000000aa.cfg"]
+    assert install_config.expired(found, 4, "00000000000000bb") == []
+    assert install_config.expired(found, 10, "00000000000000bb") == []
+
+
+def test_all_kept_without_generations():
+    found = install_config.backup_files(NAMES, "isr-2911-a")
+    assert install_config.expired(found, None, "00000000000000bb") == []
+    assert install_config.expired(found, 0, "00000000000000bb") == []
+
+
+def test_backup_of_the_running_configuration_is_kept():
+    found = install_config.backup_files(NAMES, "isr-2911-a")
+    assert install_config.expired(found, 1, "00000000000000aa") == [
+        "isr-2911-a_9e107d9d372bb6826bd81d3542a419d6.cfg",
+        "isr-2911-a_20261015080000_00000000000000cc.cfg"]
@@ -0,0 +1,119 @@
+" Cache, the output of commands which seldom change kept for a time to live."
+
+import json
+import time
+
+import cisco_ios_show as show
+from conftest import Sink, capture
+
+INVENTORY = (b"show inventory\r\n"
+             b"NAME: \"CISCO2911/K9 chassis\", DESCR: \"CISCO2911/K9 chassis\"\r\n"
+             b"PID: CISCO2911/K9      , VID: V06  , SN: FGL000000A1\r\n"
+             b"isr-2911-a#")
+
+CONFIG = (b"show running-config\r\n"
+          b"Building configuration...\r\n"
+          b"hostname isr-2911-a\r\n"
+          b"end\r\n"
+          b"isr-2911-a#")
+
+TTL = {"show inventory": 3600}
+
+
+def run(directory, *outputs):
+    " a run of the host which captures the outputs, returns the cache of the next run"
+    cache = show.Cache(Sink(), directory, "isr-2911-a", TTL)
+    cache.validate("isr-2911-a uptime is 2 weeks, 3 days, 4 hours, 5 minutes")
+    for command, data in outputs:
+        capture(cache, command, data)
+    cache.close()
+    cache = show.Cache(Sink(), directory, "isr-2911-a", TTL)
+    cache.validate("isr-2911-a uptime is 2 weeks, 3 days, 4 hours, 5 minutes")
+    return cache
+
+
+def rewrite(cache, command, **fields):
+    " change fields of the entry of a command"
+    with open(cache.entry_path(command)) as file_obj:
+        entry = json.load(file_obj)
+    entry.update(fields)
+    with open(cache.entry_path(command), "w") as file_obj:
+        json.dump(entry, file_obj)
+
+
+def test_validate_learns_the_boot_time(tmp_path):
+    cache = show.Cache(Sink(), str(tmp_path), "isr-2911-a", TTL)
+    cache.validate("isr-2911-a uptime is 1 year, 2 weeks, 3 days, 4 hours, 5 minutes")
+    seconds = 31536000 + 2 * 604800 + 3 * 86400 + 4 * 3600 + 5 * 60
+    assert abs(time.time() - seconds - cache.boot) < 5
+    cache.validate("no uptime here")
+    assert abs(time.time() - seconds - cache.boot) < 5
+
+
+def test_fresh_entry_is_found(tmp_path):
+    cache = run(str(tmp_path), ("show inventory", INVENTORY))
+    entry = cache.lookup("show  inventory")
+    assert entry["output"] == INVENTORY.decode("utf-8")
+    assert cache.lookup("show version") is None
+
+
+def test_expired_entry_is_stale(tmp_path):
+    cache = run(str(tmp_path), ("show inventory", INVENTORY))
+    rewrite(cache, "show inventory", time=time.time() - 3601)
+    assert cache.lookup("show inventory") is None
+
+
+def test_reload_makes_the_entry_stale(tmp_path):
+    cache = run(str(tmp_path), ("show inventory", INVENTORY))
+    cache.boot = cache.boot + show.Cache.SLACK / 2         # the uptime is in minutes
+    assert cache.lookup("show inventory") is not None
+    cache.boot = cache.boot + show.Cache.SLACK
+    assert cache.lookup("show inventory") is None
+    cache.boot = None                                      # the uptime was not learnt
+    assert cache.lookup("show inventory") is None
+
+
+def test_configuration_change_makes_the_entry_stale(tmp_path):
+    cache = run(str(tmp_path), ("show running-config", CONFIG), ("show inventory", INVENTORY))
+    assert cache.lookup("show inventory") is not None
+    capture(cache, "show running-config", CONFIG.replace(b"hostname isr-2911-a", b"hostname isr-2911-b"))
+    assert cache.lookup("show inventory") is None
+
+
+def test_entry_captured_before_the_configuration(tmp_path):
+    cache = run(str(tmp_path), ("show inventory", INVENTORY), ("show running-config", CONFIG))
+    assert cache.config is not None
+    assert cache.lookup("show inventory") is not None
+
+
+def test_incomplete_output_is_not_cached(tmp_path):
+    cache = show.Cache(Sink(), str(tmp_path), "isr-2911-a", TTL)
+    capture(cache, "show inventory", INVENTORY[:40], status="timeout")
+    cache.close()
+    assert cache.lookup("show inventory") is None
+
+
+def test_replay_marks_the_output(tmp_path):
+    cache = run(str(tmp_path), ("show inventory", INVENTORY))
+    sink = Sink()
+    metrics = []
+    assert cache.replay("show inventory", sink, metrics) is True
+    text = sink.text()
+    assert text.startswith("show inventory\r\n ### cached ")
+    assert text.endswith(INVENTORY.decode("utf-8")[len("show inventory\r\n"):])
+    assert sink.status == ["cached"] and metrics[0]["status"] == "cached"
+    assert cache.replay("show version", sink) is False
+
+
+def test_filtered_output_is_neither_cached_nor_replayed(tmp_path):
+    cache = run(str(tmp_path), ("show running-config", CONFIG), ("show inventory", INVENTORY))
+    config = cache.config
+    cache.partial.update(["show inventory", "show running-config"])  # filtered here, sent as they are
+    assert cache.lookup("show inventory") is None
+    capture(cache, "show running-config", CONFIG.replace(b"hostname isr-2911-a\r\n", b""))
+    capture(cache, "show inventory", INVENTORY[:40])
+    cache.close()
+    cache = show.Cache(Sink(), str(tmp_path), "isr-2911-a", TTL)
+    cache.validate("isr-2911-a uptime is 2 weeks, 3 days, 4 hours, 5 minutes")
+    assert cache.config == config
+    assert cache.lookup("show inventory")["output"] == INVENTORY.decode("utf-8")
@@ -0,0 +1,98 @@
+" config_lines and missing_lines, the payload compared with the running configuration."
+
+import cisco_ios_install_config as install_config
+
+PAYLOAD = ("!\n"
+           "!  Sample configuration file\n"
+           "!\n"
+           "ip http server\n"
+           "!\n"
+           "ip access-list extended ACL-AGENT-REDIRECT\n"
+           "remark redirect HTTP traffic only\n"
+           "permit tcp any  any eq www\n"
+           "ip access-list extended ACL-ALLOW\n"
+           "permit ip any any\n"
+           "!\n"
+           "ip name-server 8.8.8.8\n"
+           "end\n")
+
+RUNNING = ("Building configuration...\n"
+           "\n"
+           "Current configuration : 2048 bytes\n"
+           "!\n"
+           "hostname isr-2911-a\n"
+           "!\n"
+           "interface GigabitEthernet0/1\n"
+           " switchport mode access\n"
+           " shutdown\n"
+           "!\n"
+           "ip http server\n"
+           "ip access-list extended ACL-AGENT-REDIRECT\n"
+           " remark redirect HTTP traffic only\n"
+           " permit tcp any any eq www\n"
+           "ip access-list extended ACL-ALLOW\n"
+           " permit ip any any\n"
+           "!\n"
+           "policy-map PM-QOS\n"
+           " class VOICE\n"
+           "  priority percent 10\n"
+           " class class-default\n"
+           "  fair-queue\n"
+           "!\n"
+           "ip name-server 8.8.8.8\n"
+           "end\n")
+
+
+def test_flat_sections_of_a_file_for_copy():
+    assert install_config.config_lines(PAYLOAD) == [
+        ("ip http server",),
+        ("ip access-list extended ACL-AGENT-REDIRECT",),
+        ("ip access-list extended ACL-AGENT-REDIRECT", "remark redirect HTTP traffic only"),
+        ("ip access-list extended ACL-AGENT-REDIRECT", "permit tcp any any eq www"),
+        ("ip access-list extended ACL-ALLOW",),
+        ("ip access-list extended ACL-ALLOW", "permit ip any any"),
+        ("ip name-server 8.8.8.8",)]                       # after '!', not of the section
+
+
+def test_indented_and_nested_sections():
+    lines = install_config.config_lines(RUNNING)
+    assert ("hostname isr-2911-a",) in lines
+    assert ("interface GigabitEthernet0/1", "shutdown") in lines
+    assert ("policy-map PM-QOS", "class VOICE", "priority percent 10") in lines
+    assert ("policy-map PM-QOS", "class class-default", "fair-queue") in lines
+    assert ("ip name-server 8.8.8.8",) in lines
+    assert not [line for line in lines if line[-1].startswith(("Building", "Current", "end"))]
+
+
+def test_flat_payload_matches_indented_running():
+    assert install_config.missing_lines(PAYLOAD, RUNNING) == []
+    assert install_config.config_digest(PAYLOAD) != install_config.config_digest(RUNNING)
+    assert install_config.config_digest(RUNNING) == install_config.config_digest(RUNNING.replace("  ", "   "))
+
+
+def test_missing_lines_within_their_section():
+    payload = ("interface GigabitEthernet0/1\n"
+               " switchport mode trunk\n"
+               "policy-map PM-QOS\n"
+               " class VOICE\n"
+               "  priority percent 20\n"
+               "ip access-list extended ACL-ALLOW\n"
+               "permit ip any any\n"
+               "ip access-list extended ACL-DENY\n"
+               "permit ip any any\n")
+    assert install_config.missing_lines(payload, RUNNING) == [
+        "interface GigabitEthernet0/1 > switchport mode trunk",
+        "policy-map PM-QOS > class VOICE > priority percent 20",
+        "ip access-list extended ACL-DENY",
+        "ip access-list extended ACL-DENY > permit ip any any"]
+
+
+def test_negated_lines():
+    payload = ("interface GigabitEthernet0/1\n"
+               " no shutdown\n"
+               " no description\n"
+               "no ip http server\n"
+               "no ip domain lookup\n")
+    assert install_config.missing_lines(payload, RUNNING) == [
+        "interface GigabitEthernet0/1 > no shutdown",
+        "no ip http server"]
@@ -0,0 +1,92 @@
+" Drift, the running configuration written as a diff against the baseline of the last capture."
+
+import cisco_ios_show as show
+from conftest import Sink, capture
+
+CONFIG = (b"show running-config\r\n"
+          b"Building configuration...\r\n"
+          b"\r\n"
+          b"Current configuration : 1234 bytes\r\n"
+          b"!\r\n"
+          b"! Last configuration change at 10:00:00 UTC Fri Oct 16 2026\r\n"
+          b"hostname isr-2911-a\r\n"
+          b"interface GigabitEthernet0/1\r\n"
+          b" switchport mode access\r\n"
+          b"end\r\n"
+          b"isr-2911-a#")
+
+
+def test_parse_less_echo_prompt_and_volatile_lines():
+    first, last, lines = show.Drift.parse(CONFIG, "show running-config")
+    assert CONFIG[:first] == b"show running-config\r\n"
+    assert CONFIG[last:] == b"isr-2911-a#"
+    assert lines == ["!", "hostname isr-2911-a", "interface GigabitEthernet0/1", " switchport mode access", "end"]
+
+
+def test_parse_without_echo():
+    data = b"hostname isr-2911-a\nend\n"                   # an exec channel, no echo and no prompt
+    first, last, lines = show.Drift.parse(data, "show running-config")
+    assert (first, last) == (0, len(data))
+    assert lines == ["hostname isr-2911-a", "end"]
+
+
+def test_command_matches_abbreviations():
+    for command in ("sh run", "show running-config", "show run all", "sho runn"):
+        assert show.Drift.COMMAND.match(command)
+    assert not show.Drift.COMMAND.match("show version")
+
+
+def test_first_capture_written_in_full(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a")
+    assert capture(drift, "show running-config", CONFIG) == CONFIG.decode("utf-8")
+    assert drift.changes[0]["status"] == "new"
+    assert (tmp_path / "baselines" / "isr-2911-a" / "show_running-config.cfg").exists()
+
+
+def test_unchanged_ignores_volatile_lines(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a")
+    capture(drift, "show running-config", CONFIG)
+    later = CONFIG.replace(b"10:00:00", b"11:30:00")
+    text = capture(drift, "show running-config", later)
+    assert text.startswith("show running-config\r\n ### no change, sha256 ")
+    assert text.endswith("isr-2911-a#")
+    assert drift.changes[1]["status"] == "unchanged"
+    assert drift.result()["changed"] is False
+
+
+def test_changed_is_a_unified_diff(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a")
+    capture(drift, "show running-config", CONFIG)
+    text = capture(drift, "show running-config", CONFIG.replace(b" switchport mode access", b" switchport mode trunk"))
+    assert "- switchport mode access" in text
+    assert "+ switchport mode trunk" in text
+    change = drift.changes[1]
+    assert (change["status"], change["added"], change["removed"]) == ("changed", 1, 1)
+    assert drift.result()["changed"] is True
+
+
+def test_incomplete_capture_keeps_the_baseline(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a")
+    capture(drift, "show running-config", CONFIG)
+    partial = CONFIG[:60]
+    assert capture(drift, "show running-config", partial, "timeout") == partial.decode("utf-8")
+    assert drift.changes[1]["status"] == "timeout"
+    capture(drift, "show running-config", CONFIG)
+    assert drift.changes[2]["status"] == "unchanged"
+
+
+def test_other_commands_pass_through(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a")
+    assert capture(drift, "show version", b"show version\r\nuptime is 1 day\r\nisr-2911-a#") == \
+        "show version\r\nuptime is 1 day\r\nisr-2911-a#"
+    assert drift.changes == []
+
+
+def test_filtered_capture_passes_through(tmp_path):
+    drift = show.Drift(Sink(), str(tmp_path), "isr-2911-a", set(["show running-config | section interface"]))
+    capture(drift, "show running-config", CONFIG)
+    section = CONFIG.replace(b"hostname isr-2911-a\r\n", b"")
+    assert capture(drift, "show running-config | section interface", section) == section.decode("utf-8")
+    assert [change["status"] for change in drift.changes] == ["new"]
+    capture(drift, "show running-config", CONFIG)
+    assert drift.changes[1]["status"] == "unchanged"
@@ -0,0 +1,85 @@
+" LocalFilter, the output modifiers of IOS applied to the output of devices which do not support them."
+
+import cisco_ios_show as show
+from conftest import Sink
+
+CONFIG = ("show running-config\r\n"
+          "hostname isr-2911-a\r\n"
+          "interface GigabitEthernet0/0\r\n"
+          " description uplink\r\n"
+          " ip address 10.0.0.1 255.255.255.0\r\n"
+          "interface GigabitEthernet0/1\r\n"
+          " shutdown\r\n"
+          "router ospf 1\r\n"
+          " network 10.0.0.0 0.0.0.255 area 0\r\n"
+          "end\r\n"
+          "isr-2911-a#")
+
+
+def apply(filters, output, size=None):
+    " write the output through the filters, in writes of size, return what passes them"
+    node = show.IOS.__new__(show.IOS)
+    node.local = {"show running-config": filters}
+    sink = Sink()
+    local = node.local_filter("show running-config", sink)
+    local.begin("show running-config")
+    size = size or len(output)
+    for start in range(0, len(output), size):
+        local.write(output[start:start + size])
+    local.end("ok")
+    assert sink.status == ["ok"]
+    return sink.text()
+
+
+def test_include():
+    assert apply([("include", "^interface")], CONFIG) == (
+        "show running-config\r\ninterface GigabitEthernet0/0\r\ninterface GigabitEthernet0/1\r\nisr-2911-a#")
+
+
+def test_exclude():
+    assert apply([("exclude", "^ ")], CONFIG) == (
+        "show running-config\r\nhostname isr-2911-a\r\ninterface GigabitEthernet0/0\r\n"
+        "interface GigabitEthernet0/1\r\nrouter ospf 1\r\nend\r\nisr-2911-a#")
+
+
+def test_begin():
+    assert apply([("begin", "^router")], CONFIG) == (
+        "show running-config\r\nrouter ospf 1\r\n network 10.0.0.0 0.0.0.255 area 0\r\nend\r\nisr-2911-a#")
+
+
+def test_section():
+    assert apply([("section", "shutdown")], CONFIG) == (
+        "show running-config\r\ninterface GigabitEthernet0/1\r\n shutdown\r\nisr-2911-a#")
+
+
+def test_filters_applied_in_order():
+    assert apply([("section", "^interface"), ("exclude", "shutdown")], CONFIG) == (
+        "show running-config\r\ninterface GigabitEthernet0/0\r\n description uplink\r\n"
+        " ip address 10.0.0.1 255.255.255.0\r\ninterface GigabitEthernet0/1\r\nisr-2911-a#")
+
+
+def test_lines_split_across_writes():
+    for size in (1, 5, 17):
+        assert apply([("section", "shutdown")], CONFIG, size) == apply([("section", "shutdown")], CONFIG)
+
+
+def test_marks_pass_through():
+    output = "show running-config\r\n ### output truncated at 10 bytes ###\r\nhostname isr-2911-a\r\nisr-2911-a#"
+    assert apply([("include", "^interface")], output) == (
+        "show running-config\r\n ### output truncated at 10 bytes ###\r\nisr-2911-a#")
+
+
+def test_filtered_commands_are_partial():
+    node = show.IOS.__new__(show.IOS)
+    node.filters = {"show running-config": [("section", "^interface"), ("exclude", "shutdown")],
+                    "show inventory": [("include", "PID")]}
+    node.local, node.original, node.partial = {}, {}, set()
+    node.pipes = True
+    assert node.filter_commands(["show running-config", "show inventory", "show version"]) == [
+        "show running-config | section ^interface", "show inventory | include PID", "show version"]
+    assert node.local == {"show running-config | section ^interface": [("exclude", "shutdown")]}
+    assert node.partial == set(["show running-config | section ^interface", "show inventory | include PID"])
+    node.local, node.original, node.partial = {}, {}, set()
+    node.pipes = False
+    assert node.filter_commands(["show running-config", "show version"]) == ["show running-config", "show version"]
+    assert node.partial == set(["show running-config"])
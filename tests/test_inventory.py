@@ -0,0 +1,44 @@
+" read_inventory, the hosts of an Ansible INI inventory."
+
+from module_utils.ios_common import read_inventory
+
+INVENTORY = """# routers of the lab
+isr-2911-a ansible_host=10.0.0.1
+isr-2911-b
+
+[routers]
+isr-2911-a
+isr-2911-c ansible_host=10.0.0.3 ansible_port=2222  ; the spare
+
+[switches]
+sw-3850-a
+sw-3850-b
+
+[switches:vars]
+ansible_network_os=ios
+ntp_server=10.0.0.254
+
+[campus:children]
+routers
+switches
+
+[all:vars]
+ansible_user=admin
+ansible_connection=local
+
+[spares]
+isr-1941-a
+"""
+
+
+def test_hosts_of_the_groups(tmp_path):
+    path = tmp_path / "hosts"
+    path.write_text(INVENTORY)
+    assert read_inventory(str(path)) == ["isr-2911-a", "isr-2911-b", "isr-2911-c", "sw-3850-a", "sw-3850-b",
+                                         "isr-1941-a"]
+
+
+def test_one_host_per_line(tmp_path):
+    path = tmp_path / "hosts"
+    path.write_text("10.0.0.1\n\n10.0.0.2\n10.0.0.1\n")
+    assert read_inventory(str(path)) == ["10.0.0.1", "10.0.0.2"]
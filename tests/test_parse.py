@@ -0,0 +1,142 @@
+" TableParser, the output of commands parsed into records of the columns of their table."
+
+import cisco_ios_show as show
+
+BRIEF = ("show ip interface brief\r\n"
+         "Interface              IP-Address      OK? Method Status                Protocol\r\n"
+         "GigabitEthernet0/0     10.0.0.1        YES NVRAM  up                    up      \r\n"
+         "GigabitEthernet0/1     unassigned      YES unset  administratively down down    \r\n"
+         "isr-2911-a#")
+
+ROUTE = ("show ip route\r\n"
+         "Gateway of last resort is 10.0.0.254 to network 0.0.0.0\r\n"
+         "\r\n"
+         "S*    0.0.0.0/0 [1/0] via 10.0.0.254\r\n"
+         "      10.0.0.0/8 is variably subnetted, 2 subnets, 2 masks\r\n"
+         "C        10.0.0.0/24 is directly connected, GigabitEthernet0/0\r\n"
+         "O        10.1.0.0/24 [110/2] via 10.0.0.2, 00:01:02, GigabitEthernet0/0\r\n"
+         "                    [110/2] via 10.0.0.3, 00:01:02, GigabitEthernet0/0\r\n"
+         "      172.16.0.0/16 is subnetted, 1 subnets\r\n"
+         "D        172.16.1.0\r\n"
+         "           [90/3072] via 10.0.0.4, 1d02h, GigabitEthernet0/0\r\n"
+         "isr-2911-a#")
+
+CDP = ("show cdp neighbors detail\r\n"
+       "-------------------------\r\n"
+       "Device ID: sw-3850-a.example.com\r\n"
+       "Entry address(es): \r\n"
+       "  IP address: 10.0.0.2\r\n"
+       "  IP address: 10.0.9.2\r\n"
+       "Platform: cisco WS-C3850-24T,  Capabilities: Router Switch IGMP \r\n"
+       "Interface: GigabitEthernet0/0,  Port ID (outgoing port): GigabitEthernet1/0/1\r\n"
+       "Holdtime : 155 sec\r\n"
+       "\r\n"
+       "Version :\r\n"
+       "Cisco IOS Software, IOS-XE Software, Catalyst L3 Switch Software, Version 16.12.4, RELEASE SOFTWARE\r\n"
+       "\r\n"
+       "Native VLAN: 1\r\n"
+       "Duplex: full\r\n"
+       "\r\n"
+       "-------------------------\r\n"
+       "Device ID: isr-2911-b\r\n"
+       "Entry address(es): \r\n"
+       "  IP address: 10.0.0.3\r\n"
+       "Platform: Cisco CISCO2911/K9,  Capabilities: Router Switch IGMP \r\n"
+       "Interface: GigabitEthernet0/1,  Port ID (outgoing port): GigabitEthernet0/1\r\n"
+       "Holdtime : 170 sec\r\n"
+       "isr-2911-a#")
+
+VLAN = ("show vlan brief\r\n"
+        "\r\n"
+        "VLAN Name                             Status    Ports\r\n"
+        "---- -------------------------------- --------- -------------------------------\r\n"
+        "1    default                          active    Gi1/0/2, Gi1/0/3, Gi1/0/4\r\n"
+        "                                                Gi1/0/5, Gi1/0/6\r\n"
+        "10   users                            active    \r\n"
+        "\r\n"
+        "VLAN Type  SAID       MTU   Parent RingNo BridgeNo Stp  BrdgMode Trans1 Trans2\r\n"
+        "---- ----- ---------- ----- ------ ------ -------- ---- -------- ------ ------\r\n"
+        "1    enet  100001     1500  -      -      -        -    -        0      0\r\n"
+        "sw-3850-a#")
+
+TRUNK = ("show interfaces trunk\r\n"
+         "\r\n"
+         "Port        Mode             Encapsulation  Status        Native vlan\r\n"
+         "Gi1/0/1     on               802.1q         trunking      1\r\n"
+         "Gi1/0/24    desirable        n-802.1q       trunking      99\r\n"
+         "\r\n"
+         "Port        Vlans allowed on trunk\r\n"
+         "Gi1/0/1     1-4094\r\n"
+         "Gi1/0/24    10,20\r\n"
+         "\r\n"
+         "Port        Vlans allowed and active in management domain\r\n"
+         "Gi1/0/1     1,10\r\n"
+         "Gi1/0/24    10,20\r\n"
+         "\r\n"
+         "Port        Vlans in spanning tree forwarding state and not pruned\r\n"
+         "Gi1/0/1     1,10\r\n"
+         "Gi1/0/24    none\r\n"
+         "sw-3850-a#")
+
+
+def test_find_table_matches_abbreviations():
+    assert show.find_table("sh ip int br")["name"] == "ip_interface_brief"
+    assert show.find_table("show  ip route  vrf blue")["name"] == "ip_route"
+    assert show.find_table("sh cdp n det")["name"] == "cdp_neighbor_detail"
+    assert show.find_table("show vlan brief")["name"] == "vlan"
+    assert show.find_table("show int trunk")["name"] == "interface_trunk"
+    assert show.find_table("show version") is None
+    assert show.parse_output("show version", "") is None
+
+
+def test_ip_interface_brief():
+    assert show.parse_output("show ip interface brief", BRIEF) == [
+        dict(interface="GigabitEthernet0/0", ip_address="10.0.0.1", ok="YES", method="NVRAM", status="up",
+             protocol="up"),
+        dict(interface="GigabitEthernet0/1", ip_address="unassigned", ok="YES", method="unset",
+             status="administratively down", protocol="down")]
+
+
+def test_ip_route_paths_and_subnets():
+    records = show.parse_output("show ip route", ROUTE)
+    assert [(record["protocol"], record["prefix"], record["next_hop"]) for record in records] == [
+        ("S*", "0.0.0.0/0", "10.0.0.254"),
+        ("C", "10.0.0.0/24", None),
+        ("O", "10.1.0.0/24", "10.0.0.2"),
+        ("O", "10.1.0.0/24", "10.0.0.3"),                  # another path of the route
+        ("D", "172.16.1.0/16", "10.0.0.4")]                # the mask of the classful network
+    assert records[2]["distance"] == 110 and records[2]["metric"] == 2
+    assert records[1]["interface"] == "GigabitEthernet0/0"
+    assert records[4]["age"] == "1d02h" and records[4]["metric"] == 3072
+
+
+def test_cdp_neighbor_detail():
+    first, second = show.parse_output("show cdp neighbors detail", CDP)
+    assert first == dict(device_id="sw-3850-a.example.com", ip_address="10.0.0.2", platform="cisco WS-C3850-24T",
+                         capabilities="Router Switch IGMP", local_interface="GigabitEthernet0/0",
+                         remote_interface="GigabitEthernet1/0/1", holdtime=155, software_version="16.12.4",
+                         native_vlan=1, duplex="full")
+    assert (second["device_id"], second["holdtime"], second["native_vlan"]) == ("isr-2911-b", 170, None)
+
+
+def test_vlan_ports_continue_and_stop():
+    assert show.parse_output("show vlan brief", VLAN) == [
+        dict(vlan=1, name="default", status="active", ports="Gi1/0/2, Gi1/0/3, Gi1/0/4, Gi1/0/5, Gi1/0/6"),
+        dict(vlan=10, name="users", status="active", ports=None)]
+
+
+def test_interface_trunk_sections_merged_by_port():
+    assert show.parse_output("show interfaces trunk", TRUNK) == [
+        dict(port="Gi1/0/1", mode="on", encapsulation="802.1q", status="trunking", native_vlan=1,
+             allowed="1-4094", active="1,10", forwarding="1,10"),
+        dict(port="Gi1/0/24", mode="desirable", encapsulation="n-802.1q", status="trunking", native_vlan=99,
+             allowed="10,20", active="10,20", forwarding="none")]
+
+
+def test_lines_split_across_writes():
+    records = []
+    parser = show.TableParser(show.find_table("show ip interface brief"), records.append)
+    for start in range(0, len(BRIEF), 7):
+        parser.feed(BRIEF[start:start + 7])
+    parser.close()
+    assert records == show.parse_output("show ip interface brief", BRIEF)
@@ -0,0 +1,35 @@
+" payload_lines and batches, the lines of a configuration sent in configuration mode."
+
+import cisco_ios_install_config as install_config
+
+PAYLOAD = ("!\n"
+           "!  Sample configuration file\n"
+           "#  a comment\n"
+           "ip http server\n"
+           "\n"
+           "ip access-list extended ACL-ALLOW\n"
+           " permit ip any any   \n"
+           "!\n"
+           "end\n")
+
+
+def test_payload_lines():
+    assert install_config.payload_lines(PAYLOAD) == [
+        "ip http server", "ip access-list extended ACL-ALLOW", " permit ip any any"]
+    assert install_config.payload_lines("!\nend\n") == []
+
+
+def test_batches_within_size():
+    lines = ["a" * 9, "b" * 9, "c" * 9, "d" * 4]           # 10, 10, 10 and 5 bytes with the newline
+    assert install_config.batches(lines, 20) == [["a" * 9, "b" * 9], ["c" * 9, "d" * 4]]
+    assert install_config.batches(lines, 35) == [lines]
+    assert install_config.batches(lines, 34) == [lines[:3], lines[3:]]
+
+
+def test_long_line_is_a_batch_of_its_own():
+    lines = ["short", "x" * 50, "short"]
+    assert install_config.batches(lines, 20) == [["short"], ["x" * 50], ["short"]]
+
+
+def test_no_lines():
+    assert install_config.batches([], 1024) == []
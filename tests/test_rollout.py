@@ -0,0 +1,33 @@
+" waves, the hosts of a rollout split into waves which grow after the canary."
+
+import cisco_ios_install_config as install_config
+
+HOSTS = ["isr-%02d" % count for count in range(20)]
+
+
+def sizes(*args, **kwargs):
+    return [len(wave) for wave in install_config.waves(*args, **kwargs)]
+
+
+def test_waves_double_after_the_canary():
+    assert sizes(HOSTS) == [1, 2, 4, 8, 5]
+    assert [host for wave in install_config.waves(HOSTS) for host in wave] == HOSTS
+
+
+def test_canary_and_growth():
+    assert sizes(HOSTS, canary=3, growth=3.0) == [3, 9, 8]
+    assert sizes(HOSTS, canary=0) == [1, 2, 4, 8, 5]       # at least one host
+
+
+def test_growth_below_two_adds_a_host():
+    assert sizes(HOSTS, growth=1.0) == [1, 2, 3, 4, 5, 5]
+    assert sizes(HOSTS, canary=4, growth=1.2) == [4, 5, 6, 5]
+
+
+def test_largest_wave():
+    assert sizes(HOSTS, largest=3) == [1, 2, 3, 3, 3, 3, 3, 2]
+
+
+def test_no_hosts():
+    assert install_config.waves([]) == []
+    assert install_config.waves(HOSTS[:1], canary=5) == [HOSTS[:1]]